@@ -1,16 +1,19 @@
 """Run the full analysis pipeline: preprocess → ingest → similarity → analysis → export."""
-import json
 import sys
 import click
-import numpy as np
 
-from .config import METADATA_FILE, PROCESSED_DIR, CHROMA_DIR, WEB_DATA_DIR
+from .config import PROCESSED_DIR, PREPROCESS_WORKERS, EMBED_WORKERS
 from .preprocess import preprocess_all
-from .ingest import load_metadata, chunk_text, get_or_create_collection
+from .ingest import (
+    load_metadata, get_or_create_collection, get_or_create_cloud_collection, prepare_policy,
+    ingest_incremental, format_throughput, CloudSync, format_sync_report,
+)
 from .embeddings import get_embedding_function
+from .corpus import load_corpus, snapshot_dir
 from .similarity import get_collection, compute_similarity_matrix, compute_dimension_scores
 from .analysis import hierarchical_clustering, compute_tsne, validate_clusters
 from .export import export_results
+from .registry import collection_name, get_chroma_client, load_times
 
 
 @click.command()
@@ -18,7 +21,12 @@ from .export import export_results
 @click.option("--skip-ingest", is_flag=True, help="Skip ChromaDB ingestion step")
 @click.option("--force", is_flag=True, help="Force reprocessing of all steps")
 @click.option("--no-cloud", is_flag=True, help="Skip Chroma Cloud sync")
-def main(skip_preprocess: bool, skip_ingest: bool, force: bool, no_cloud: bool):
+@click.option("--workers", default=PREPROCESS_WORKERS, show_default=True,
+              help="Parallel processes for PDF extraction")
+@click.option("--embed-workers", default=EMBED_WORKERS, show_default=True,
+              help="Processes for local embedding, each with its own model copy")
+def main(skip_preprocess: bool, skip_ingest: bool, force: bool, no_cloud: bool, workers: int,
+         embed_workers: int):
     """Run the full analysis pipeline."""
 
     # ── Step 1: Preprocess PDFs ──
@@ -26,7 +34,7 @@ def main(skip_preprocess: bool, skip_ingest: bool, force: bool, no_cloud: bool):
         click.echo("\n" + "=" * 50)
         click.echo("STEP 1: PDF TEXT EXTRACTION")
         click.echo("=" * 50)
-        results = preprocess_all(force=force)
+        results = preprocess_all(force=force, workers=workers)
         total = len(results["processed"]) + len(results["skipped"])
         click.echo(f"  Ready: {total} documents")
         if results["failed"]:
@@ -45,19 +53,18 @@ def main(skip_preprocess: bool, skip_ingest: bool, force: bool, no_cloud: bool):
             click.echo("  No policies in metadata.json!")
             sys.exit(1)
 
-        collection = get_or_create_collection()
+        collection = get_or_create_collection(embed_workers)
 
         if force:
             # Delete existing collection and recreate
-            import chromadb
-            client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+            client = get_chroma_client()
             try:
-                client.delete_collection("politicas_ia_educacion")
+                client.delete_collection(collection_name())
             except Exception:
                 pass
-            collection = get_or_create_collection()
+            collection = get_or_create_collection(embed_workers)
 
-        ingested = 0
+        prepared = []
         for p in metadata["policies"]:
             pid = p["policy_id"]
             txt_path = PROCESSED_DIR / f"{pid}.txt"
@@ -65,32 +72,23 @@ def main(skip_preprocess: bool, skip_ingest: bool, force: bool, no_cloud: bool):
                 click.echo(f"  SKIP  {pid} (no processed file)")
                 continue
 
-            # Check if already ingested
-            existing = collection.get(where={"policy_id": pid})
-            if existing["ids"] and not force:
-                click.echo(f"  SKIP  {pid} (already in ChromaDB)")
-                continue
-
-            text = txt_path.read_text(encoding="utf-8")
-            chunks = chunk_text(text)
-            ids = [f"{pid}_chunk_{i:04d}" for i in range(len(chunks))]
-            metadatas = [
-                {
-                    "policy_id": pid,
-                    "country": p["country"],
-                    "region": p["region"],
-                    "year": p.get("year", 0),
-                    "language": p.get("language", ""),
-                    "chunk_index": i,
-                }
-                for i in range(len(chunks))
-            ]
-            collection.add(documents=chunks, ids=ids, metadatas=metadatas)
-            click.echo(f"  OK    {pid}: {len(chunks)} chunks")
-            ingested += 1
-
-        click.echo(f"  Total ingested: {ingested}")
+            prepared.append(prepare_policy(pid, p, txt_path.read_text(encoding="utf-8")))
+
+        # Embed only new or changed chunks once, then bulk-write the vectors
+        # locally while the cloud copy is pushed in the background
+        cloud_collection = None if no_cloud or not prepared else get_or_create_cloud_collection(embed_workers)
+        sync = CloudSync(cloud_collection) if cloud_collection is not None else None
+        stats = ingest_incremental(prepared, collection, get_embedding_function(embed_workers),
+                                   sync=sync)
+        click.echo(f"  Policies checked: {len(prepared)}")
+        if prepared:
+            click.echo(f"  {format_throughput(stats)}")
+        if sync is not None:
+            for line in format_sync_report(sync.drain()):
+                click.echo(f"  {line}")
         click.echo(f"  Collection size: {collection.count()} chunks")
+        load_corpus(collection)
+        click.echo(f"  Snapshot: {snapshot_dir(collection)}")
     else:
         click.echo("\n  [Skipping ingestion]")
 
@@ -109,11 +107,13 @@ def main(skip_preprocess: bool, skip_ingest: bool, force: bool, no_cloud: bool):
 
     collection = get_collection()
     click.echo(f"  Computing similarity matrix for {len(policy_ids)} policies...")
-    sim_matrix, valid_ids = compute_similarity_matrix(collection, policy_ids)
+    corpus = load_corpus(collection)
+    click.echo(f"  Loaded {len(corpus.vectors)} chunk embeddings for {len(corpus)} policies")
+    sim_matrix, valid_ids = compute_similarity_matrix(collection, policy_ids, corpus)
     click.echo(f"  Matrix shape: {sim_matrix.shape}")
 
     click.echo(f"  Computing dimension scores (7 dimensions)...")
-    dim_scores = compute_dimension_scores(collection, valid_ids)
+    dim_scores = compute_dimension_scores(collection, valid_ids, corpus)
     click.echo(f"  Scores computed for {len(dim_scores)} policies")
 
     # ── Step 4: Clustering ──
@@ -154,6 +154,8 @@ def main(skip_preprocess: bool, skip_ingest: bool, force: bool, no_cloud: bool):
     click.echo(f"{'=' * 50}")
     click.echo(f"  Policies analyzed: {len(valid_ids)}")
     click.echo(f"  Results: {output_file}")
+    for name, seconds in load_times().items():
+        click.echo(f"  Loaded {name} in {seconds:.2f}s")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,275 @@
+"""Micro-benchmarks for pipeline stages.
+
+Usage:
+    python -m pipeline.bench pages references/eu2024aiact_regulation-2024-1689.pdf --workers 4
+    python -m pipeline.bench clean references/*.pdf
+    python -m pipeline.bench embed-pool --workers 1,2,4,8 --chunks 2000
+    python -m pipeline.bench onnx --max-chunks 100
+    python -m pipeline.bench similarity --sizes 14,100,1000,10000
+"""
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import numpy as np
+from pypdf import PdfReader, PdfWriter
+
+from .chunking import make_chunks
+from .config import PROCESSED_DIR, RAW_DIR, ONNX_MIN_SPEARMAN, ONNX_QUANTIZE
+from .preprocess import PageTextCache, clean_text, extract_pdf
+
+
+def _timed(fn, *args, **kwargs):
+    """Run fn once and return (result, elapsed seconds)."""
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+@click.group()
+def main():
+    """Benchmark individual pipeline stages."""
+
+
+@main.command()
+@click.argument("pdf_path", type=click.Path(exists=True, path_type=Path))
+@click.option("--workers", default=4, show_default=True, help="Page workers for the parallel run")
+@click.option("--counts", default="25,50,100,200,400", show_default=True,
+              help="Comma-separated page counts to test (capped at the PDF's length)")
+def pages(pdf_path: Path, workers: int, counts: str):
+    """Wall-clock speedup of page-parallel extract_pdf against page count."""
+    reader = PdfReader(pdf_path)
+    n_total = len(reader.pages)
+    page_counts = sorted({min(int(c), n_total) for c in counts.split(",")})
+
+    click.echo(f"{pdf_path.name}: {n_total} pages, {workers} page workers\n")
+    click.echo(f"  {'pages':>6} {'serial (s)':>11} {'parallel (s)':>13} {'speedup':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in page_counts:
+            # Truncated copy of the document with the first n pages
+            writer = PdfWriter()
+            for page in reader.pages[:n]:
+                writer.add_page(page)
+            sample = Path(tmp) / f"sample_{n}.pdf"
+            with open(sample, "wb") as f:
+                writer.write(f)
+
+            serial, t_serial = _timed(extract_pdf, sample, page_workers=1, page_cache=False)
+            parallel, t_parallel = _timed(extract_pdf, sample, page_workers=workers,
+                                          page_cache=False)
+            if parallel != serial:
+                raise click.ClickException(f"Parallel output differs from serial at {n} pages")
+            click.echo(f"  {n:>6} {t_serial:>11.2f} {t_parallel:>13.2f} {t_serial / t_parallel:>7.2f}x")
+
+
+@main.command("page-cache")
+@click.argument("pdf_path", type=click.Path(exists=True, path_type=Path))
+def page_cache(pdf_path: Path):
+    """Cold vs warm extraction through PageTextCache (in a scratch cache dir)."""
+    reader = PdfReader(pdf_path)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PageTextCache(Path(tmp))
+        cold, t_cold = _timed(lambda: [cache.extract(p) for p in reader.pages])
+        misses = cache.misses
+        warm, t_warm = _timed(lambda: [cache.extract(p) for p in reader.pages])
+    if cold != warm:
+        raise click.ClickException("Cached page text differs from extracted text")
+    click.echo(f"{pdf_path.name}: {len(reader.pages)} pages")
+    click.echo(f"  cold: {t_cold:.2f}s ({misses} extracted)")
+    click.echo(f"  warm: {t_warm:.2f}s ({cache.hits} cache hits, {t_cold / t_warm:.1f}x faster)")
+
+
+# Artifacts the cleaner removes, counted to show the golden check exercises them
+_ARTIFACT_PATTERNS = [re.compile(r"\b\d{1,3}\s*\|\s*"),
+                      re.compile(r"Page \d+ of \d+", re.IGNORECASE), re.compile(r"\.{4,}")]
+
+
+def _clean_text_multipass(text: str) -> str:
+    """Reference five-pass clean_text: plain re.sub calls, uncompiled and unguarded."""
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\b\d{1,3}\s*\|\s*", "", text)
+    text = re.sub(r"Page \d+ of \d+", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\.{4,}", " ", text)
+    text = re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", text)
+    return text.strip()
+
+
+@main.command()
+@click.argument("pdf_paths", nargs=-1, type=click.Path(exists=True, path_type=Path))
+@click.option("--repeat", default=5, show_default=True, help="Timed runs per file (best is kept)")
+def clean(pdf_paths: tuple[Path, ...], repeat: int):
+    """Golden-output check and MB/s of the guarded compiled multipass clean_text.
+
+    Compares it with the plain five-pass reference on text freshly extracted
+    from the source PDFs (policies/raw/ by default), since processed texts no
+    longer contain the artifacts.
+    """
+    files = list(pdf_paths) or sorted(RAW_DIR.rglob("*.pdf"))
+    if not files:
+        raise click.ClickException(f"No PDFs given and none in {RAW_DIR}")
+
+    click.echo(f"  {'file':<42} {'MB':>6} {'artifacts':>9} {'re.sub MB/s':>12} "
+               f"{'guarded MB/s':>12} {'same':>5}")
+    total_mb = total_before = total_after = 0.0
+    mismatches = []
+    for path in files:
+        try:
+            text = extract_pdf(path, page_workers=1)
+        except Exception as e:
+            click.echo(f"  {path.stem[:42]:<42} skipped ({type(e).__name__})")
+            continue
+        mb = len(text.encode("utf-8")) / 1e6
+        collapsed = " ".join(text.split())
+        artifacts = sum(len(pattern.findall(collapsed)) for pattern in _ARTIFACT_PATTERNS)
+        before = min(_timed(_clean_text_multipass, text)[1] for _ in range(repeat))
+        after = min(_timed(clean_text, text)[1] for _ in range(repeat))
+        same = clean_text(text).encode("utf-8") == _clean_text_multipass(text).encode("utf-8")
+        if not same:
+            mismatches.append(path.name)
+        total_mb += mb
+        total_before += before
+        total_after += after
+        click.echo(f"  {path.stem[:42]:<42} {mb:>6.2f} {artifacts:>9} {mb / before:>12.1f} "
+                   f"{mb / after:>12.1f} {'yes' if same else 'NO':>5}")
+
+    click.echo(f"\n  Total {total_mb:.2f} MB: {total_mb / total_before:.1f} MB/s -> "
+               f"{total_mb / total_after:.1f} MB/s ({total_before / total_after:.2f}x)")
+    if mismatches:
+        raise click.ClickException(f"Output differs for: {', '.join(mismatches)}")
+
+
+@main.command("embed-pool")
+@click.option("--workers", "worker_counts", default="1,2,4,8", show_default=True,
+              help="Comma-separated worker counts to test")
+@click.option("--chunks", "n_chunks", default=2000, show_default=True,
+              help="Chunks of the processed corpus to embed per run")
+def embed_pool(worker_counts: str, n_chunks: int):
+    """Local embedding throughput (chunks/s) of EmbeddingPool against worker count."""
+    from .embeddings import EmbeddingPool
+
+    texts = []
+    for path in sorted(PROCESSED_DIR.glob("*.txt")):
+        texts.extend(make_chunks(path.read_text(encoding="utf-8")))
+        if len(texts) >= n_chunks:
+            break
+    texts = texts[:n_chunks]
+    if not texts:
+        raise click.ClickException(f"No processed texts in {PROCESSED_DIR}")
+
+    click.echo(f"{len(texts)} chunks\n")
+    click.echo(f"  {'workers':>7} {'threads':>8} {'seconds':>8} {'chunks/s':>9} {'speedup':>8}")
+    baseline = reference = None
+    for workers in sorted({int(w) for w in worker_counts.split(",")}):
+        with EmbeddingPool(workers) as pool:
+            pool(texts[:workers])  # models loaded and warm before timing
+            vectors, elapsed = _timed(pool, texts)
+        vectors = np.stack(vectors)
+        if reference is None:
+            reference = vectors
+        elif not np.allclose(vectors, reference, atol=1e-5):
+            raise click.ClickException(f"{workers} workers changed the embeddings")
+        rate = len(texts) / elapsed
+        baseline = baseline or rate
+        click.echo(f"  {workers:>7} {pool.threads:>8} {elapsed:>8.2f} {rate:>9.1f} "
+                   f"{rate / baseline:>7.2f}x")
+
+
+def _policy_similarity(vectors: np.ndarray, counts: list[int]) -> np.ndarray:
+    """Cosine similarity matrix of per-policy mean chunk vectors."""
+    bounds = np.cumsum([0] + counts)
+    means = np.stack([vectors[a:b].mean(axis=0) for a, b in zip(bounds[:-1], bounds[1:])])
+    means /= np.linalg.norm(means, axis=1, keepdims=True)
+    return means @ means.T
+
+
+@main.command()
+@click.option("--max-chunks", default=100, show_default=True,
+              help="Chunks per policy, from the start of each text")
+@click.option("--threshold", default=ONNX_MIN_SPEARMAN, show_default=True,
+              help="Minimum Spearman rho of the similarity matrix against torch")
+@click.option("--quantize/--no-quantize", default=ONNX_QUANTIZE, show_default=True)
+def onnx(max_chunks: int, threshold: float, quantize: bool):
+    """Latency, throughput and accuracy gate of the ONNX backend against torch."""
+    from scipy.stats import spearmanr
+    from .embeddings import LocalEmbeddingFunction, OnnxEmbeddingFunction
+
+    policies = {path.stem: list(make_chunks(path.read_text(encoding="utf-8")))[:max_chunks]
+                for path in sorted(PROCESSED_DIR.glob("*.txt"))}
+    if len(policies) < 2:
+        raise click.ClickException(f"Need at least 2 processed texts in {PROCESSED_DIR}")
+    texts = [chunk for chunks in policies.values() for chunk in chunks]
+    counts = [len(chunks) for chunks in policies.values()]
+
+    onnx_name = "onnx-int8" if quantize else "onnx"
+    backends = {
+        "torch": LocalEmbeddingFunction,
+        onnx_name: lambda: OnnxEmbeddingFunction(quantize=quantize),
+    }
+    click.echo(f"{len(policies)} policies, {len(texts)} chunks\n")
+    click.echo(f"  {'backend':<10} {'load (s)':>9} {'latency (ms)':>13} {'chunks/s':>9}")
+    matrices = {}
+    for name, make in backends.items():
+        fn, t_load = _timed(make)
+        fn(texts[:8])  # warm-up
+        latency = np.median([_timed(fn, [text])[1] for text in texts[:20]])
+        vectors, elapsed = _timed(fn, texts)
+        matrices[name] = _policy_similarity(np.stack(vectors), counts)
+        click.echo(f"  {name:<10} {t_load:>9.1f} {1000 * latency:>13.1f} "
+                   f"{len(texts) / elapsed:>9.1f}")
+
+    upper = np.triu_indices(len(policies), k=1)
+    rho = spearmanr(matrices["torch"][upper], matrices[onnx_name][upper]).correlation
+    max_diff = np.abs(matrices["torch"] - matrices[onnx_name]).max()
+    click.echo(f"\n  Similarity matrix vs torch: Spearman rho = {rho:.4f}, "
+               f"max |diff| = {max_diff:.4f} (gate: rho >= {threshold})")
+    if rho < threshold:
+        raise click.ClickException(f"{onnx_name} fails the accuracy gate ({rho:.4f} < {threshold})")
+
+
+def _similarity_loop(vectors: np.ndarray) -> np.ndarray:
+    """The former per-pair scipy cosine loop, as a baseline."""
+    from scipy.spatial.distance import cosine
+    n = len(vectors)
+    matrix = np.zeros((n, n))
+    for i in range(n):
+        matrix[i][i] = 1.0
+        for j in range(i + 1, n):
+            matrix[i][j] = matrix[j][i] = 1 - cosine(vectors[i], vectors[j])
+    return matrix
+
+
+@main.command()
+@click.option("--sizes", default="14,100,1000,5000,10000", show_default=True,
+              help="Comma-separated numbers of policies")
+@click.option("--dim", default=384, show_default=True, help="Centroid dimensionality")
+@click.option("--loop-max", default=500, show_default=True,
+              help="Largest N timed with the per-pair loop baseline")
+def similarity(sizes: str, dim: int, loop_max: int):
+    """Blocked similarity engine (in memory and memmap) against the per-pair loop."""
+    from .similarity import cosine_similarity_matrix, similarity_memmap
+
+    rng = np.random.default_rng(42)
+    click.echo(f"  {'N':>6} {'loop s':>9} {'blocked s':>10} {'memmap s':>9} "
+               f"{'speedup':>8} {'max err':>9} {'matrix MB':>10}")
+    for n in (int(size) for size in sizes.split(",")):
+        vectors = rng.normal(size=(n, dim)).astype(np.float32)
+        matrix, blocked = _timed(cosine_similarity_matrix, vectors)
+        with tempfile.TemporaryDirectory() as tmp:
+            out = similarity_memmap(n, Path(tmp) / "similarity.f32.npy")
+            _, mapped = _timed(cosine_similarity_matrix, vectors, out=out)
+            del out
+        if n <= loop_max:
+            reference, loop = _timed(_similarity_loop, vectors)
+            error = float(np.abs(matrix - reference).max())
+            loop_s, speedup, error_s = f"{loop:.3f}", f"{loop / blocked:.0f}x", f"{error:.1e}"
+        else:
+            loop_s = speedup = error_s = "-"
+        click.echo(f"  {n:>6} {loop_s:>9} {blocked:>10.3f} {mapped:>9.3f} "
+                   f"{speedup:>8} {error_s:>9} {n * n * 4 / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""Offset-based text chunking shared by ingest, export and the validation notebook.
+
+Usage:
+    python -m pipeline.chunking truncation   # text lost to the model window per policy
+    python -m pipeline.chunking sentences    # sentence chunks against char chunks
+"""
+import re
+from collections import deque
+from collections.abc import Iterator, Sequence
+
+import click
+import numpy as np
+
+from .config import (
+    PROCESSED_DIR, CHUNK_SIZE, CHUNK_OVERLAP,
+    CHUNK_MODE, CHUNK_MAX_TOKENS, CHUNK_TOKEN_OVERLAP, CHUNK_SENTENCE_OVERLAP,
+    CHUNKER_VERSION, EMBEDDING_MODEL_LOCAL,
+)
+
+
+def chunk_spans(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> np.ndarray:
+    """Split text into overlapping windows and return their (start, end) offsets.
+
+    Windows start every chunk_size - overlap characters; each span is the
+    window with surrounding whitespace trimmed, and whitespace-only windows
+    are dropped. Returns an (n, 2) int32 array, so text[start:end] gives the
+    same strings the old slice-and-strip chunker produced.
+    """
+    step = chunk_size - overlap
+    if step <= 0:
+        raise ValueError(f"overlap ({overlap}) must be smaller than chunk_size ({chunk_size})")
+
+    n = len(text)
+    starts, ends = [], []
+    for start in range(0, n, step):
+        end = min(start + chunk_size, n)
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            starts.append(start)
+            ends.append(end)
+
+    spans = np.empty((len(starts), 2), dtype=np.int32)
+    spans[:, 0] = starts
+    spans[:, 1] = ends
+    return spans
+
+
+class Chunks(Sequence):
+    """Chunks of one text as offsets; chunk strings are sliced only on access."""
+
+    def __init__(self, text: str, spans: np.ndarray):
+        self.text = text
+        self.spans = spans
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.text[start:end] for start, end in self.spans[index].tolist()]
+        start, end = self.spans[index]
+        return self.text[start:end]
+
+    def __iter__(self):
+        text = self.text
+        for start, end in self.spans.tolist():
+            yield text[start:end]
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self.spans[:, 0]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.spans[:, 1] - self.spans[:, 0]
+
+
+def make_chunks(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Chunks:
+    """Chunk text into a lazy Chunks sequence (see chunk_spans)."""
+    return Chunks(text, chunk_spans(text, chunk_size, overlap))
+
+
+def chunk_ids(policy_id: str, n_chunks: int) -> list[str]:
+    """ChromaDB IDs for the chunks of a policy, identical in every stage."""
+    return [f"{policy_id}_chunk_{i:04d}" for i in range(n_chunks)]
+
+
+# ── Token-length chunking ──
+
+def _encode(tokenizer, texts: list[str]):
+    """Batch-encode texts without special tokens, keeping char offsets and word ids."""
+    return tokenizer(
+        texts, add_special_tokens=False, return_offsets_mapping=True,
+        return_attention_mask=False, verbose=False,
+    )
+
+
+def token_chunk_spans(offsets: np.ndarray, word_ids: np.ndarray, window: int,
+                      overlap: int) -> np.ndarray:
+    """Char spans of windows of at most `window` tokens, `overlap` tokens apart.
+
+    offsets is the (n_tokens, 2) char offset mapping of a single encoding and
+    word_ids the word index of each token. Windows are snapped back to word
+    boundaries (unless one word alone is longer than the window), so
+    re-tokenizing a chunk on its own never exceeds the window. Stops at the
+    window that reaches the last token instead of emitting tails already
+    covered by the overlap.
+    """
+    if overlap >= window:
+        raise ValueError(f"overlap ({overlap}) must be smaller than the window ({window})")
+
+    n = len(offsets)
+    if n == 0:
+        return np.empty((0, 2), dtype=np.int32)
+
+    # First token of the word each token belongs to
+    idx = np.arange(n)
+    new_word = np.ones(n, dtype=bool)
+    new_word[1:] = word_ids[1:] != word_ids[:-1]
+    word_start = np.maximum.accumulate(np.where(new_word, idx, 0)).tolist()
+
+    starts, ends = [], []
+    first = 0
+    while True:
+        # Starting mid-word costs a word-prefix token when re-tokenized
+        limit = window if word_start[first] == first else max(window - 1, 1)
+        last = min(first + limit, n)  # exclusive
+        if last < n and word_start[last] > first:
+            last = word_start[last]
+        starts.append(offsets[first, 0])
+        ends.append(offsets[last - 1, 1])
+        if last == n:
+            break
+        nxt = max(last - overlap, first + 1)
+        if word_start[nxt] > first:
+            nxt = word_start[nxt]
+        first = nxt
+
+    spans = np.empty((len(starts), 2), dtype=np.int32)
+    spans[:, 0] = starts
+    spans[:, 1] = ends
+    return spans
+
+
+def _special_tokens(tokenizer) -> int:
+    return tokenizer.num_special_tokens_to_add(pair=False)
+
+
+def make_token_chunks(texts: list[str], tokenizer=None, max_tokens: int = CHUNK_MAX_TOKENS,
+                      overlap: int = CHUNK_TOKEN_OVERLAP) -> list[Chunks]:
+    """Chunk texts so each chunk fits the model window (special tokens included).
+
+    All texts are tokenized in one batch call of the fast tokenizer; chunks
+    overlap by `overlap` tokens. Defaults to the local embedding model's
+    tokenizer.
+    """
+    if tokenizer is None:
+        from .embeddings import get_local_tokenizer
+        tokenizer = get_local_tokenizer()
+
+    window = max_tokens - _special_tokens(tokenizer)
+    encoded = _encode(tokenizer, list(texts))
+    result = []
+    for i, text in enumerate(texts):
+        offsets = np.asarray(encoded["offset_mapping"][i], dtype=np.int32).reshape(-1, 2)
+        word_ids = np.array([-1 if w is None else w for w in encoded.word_ids(i)], dtype=np.int64)
+        result.append(Chunks(text, token_chunk_spans(offsets, word_ids, window, overlap)))
+    return result
+
+
+# ── Sentence chunking ──
+
+_UPPER = "A-ZÁÉÍÓÚÑÜÂÊÔÃÕÇÀÈÌÒÙ"
+# Sentence-final punctuation (plus closing quotes/brackets), whitespace, then
+# an upper-case letter, optionally behind an opening quote or ¿ / ¡.
+_SENTENCE_END_RE = re.compile(
+    rf"([.!?…]+[\"”»')\]]*)\s+(?=[¿¡\"“«'(\[]?[{_UPPER}])"
+)
+# Lower-cased tokens that end with a period without ending the sentence (es/pt/en)
+_ABBREVIATIONS = frozenset("""
+    sr sra srta dr dra lic ing prof profa sres drs art arts núm num nº no nr
+    cap caps fig figs vol vols ed eds pág págs p pp cf etc vs e.g i.e al
+    dept depto av gov min sec inc ltd co corp jr st mr mrs ms
+""".split())
+
+
+def iter_sentence_spans(text: str) -> Iterator[tuple[int, int]]:
+    """Yield (start, end) of each sentence of text in one left-to-right pass.
+
+    Splits after . ! ? … when the next word starts upper-case, except after
+    common Spanish, Portuguese and English abbreviations, single-letter
+    initials and dotted acronyms (EE.UU., U.S.).
+    """
+    start = 0
+    for m in _SENTENCE_END_RE.finditer(text):
+        punct = m.start(1)
+        if text[punct] == "." and m.end(1) == punct + 1:
+            word = text[text.rfind(" ", start, punct) + 1:punct]
+            if (word.lower() in _ABBREVIATIONS or "." in word
+                    or (len(word) == 1 and word.isalpha())):
+                continue
+        if m.end(1) > start:
+            yield start, m.end(1)
+        start = m.end()
+    end = len(text.rstrip())
+    if end > start:
+        yield start, end
+
+
+def _split_long(text: str, start: int, end: int, max_chars: int) -> Iterator[tuple[int, int]]:
+    """Cut a span longer than max_chars at the last space before each limit."""
+    while end - start > max_chars:
+        cut = text.rfind(" ", start + 1, start + max_chars + 1)
+        if cut <= start:
+            cut = start + max_chars
+        yield start, cut
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if end > start:
+        yield start, end
+
+
+def sentence_chunk_spans(text: str, max_chars: int = CHUNK_SIZE,
+                         overlap: int = CHUNK_SENTENCE_OVERLAP) -> Iterator[tuple[int, int]]:
+    """Pack whole sentences into chunks of at most max_chars; yield their spans.
+
+    Consecutive chunks share their last/first `overlap` sentences when that
+    still fits the budget. Sentences longer than max_chars are cut at word
+    boundaries and packed as if they were sentences.
+    """
+    current: deque[tuple[int, int]] = deque()
+    for sent_start, sent_end in iter_sentence_spans(text):
+        for start, end in _split_long(text, sent_start, sent_end, max_chars):
+            if current and end - current[0][0] > max_chars:
+                yield current[0][0], current[-1][1]
+                tail = list(current)[-overlap:] if overlap > 0 else []
+                current = deque(tail)
+                while current and end - current[0][0] > max_chars:
+                    current.popleft()
+            current.append((start, end))
+    if current:
+        yield current[0][0], current[-1][1]
+
+
+def make_sentence_chunks(text: str, max_chars: int = CHUNK_SIZE,
+                         overlap: int = CHUNK_SENTENCE_OVERLAP) -> Chunks:
+    """Chunk text into whole-sentence Chunks (see sentence_chunk_spans)."""
+    spans = np.array(list(sentence_chunk_spans(text, max_chars, overlap)), dtype=np.int32)
+    return Chunks(text, spans.reshape(-1, 2))
+
+
+def chunk_document(text: str) -> Chunks:
+    """Chunk a processed policy text according to CHUNK_MODE."""
+    if CHUNK_MODE == "tokens":
+        return make_token_chunks([text])[0]
+    if CHUNK_MODE == "sentences":
+        return make_sentence_chunks(text)
+    if CHUNK_MODE != "chars":
+        raise ValueError(f"Unknown CHUNK_MODE {CHUNK_MODE!r} "
+                         "(expected 'chars', 'tokens' or 'sentences')")
+    return make_chunks(text)
+
+
+def chunking_config() -> dict:
+    """Settings that determine what chunk_document produces."""
+    if CHUNK_MODE == "tokens":
+        size, overlap = CHUNK_MAX_TOKENS, CHUNK_TOKEN_OVERLAP
+    elif CHUNK_MODE == "sentences":
+        size, overlap = CHUNK_SIZE, CHUNK_SENTENCE_OVERLAP
+    else:
+        size, overlap = CHUNK_SIZE, CHUNK_OVERLAP
+    config = {"chunk_mode": CHUNK_MODE, "chunk_size": size, "chunk_overlap": overlap,
+              "chunker_version": CHUNKER_VERSION}
+    if CHUNK_MODE == "tokens":
+        config["tokenizer"] = EMBEDDING_MODEL_LOCAL
+    return config
+
+
+def truncation_loss(chunks: Chunks, tokenizer, max_tokens: int = CHUNK_MAX_TOKENS) -> dict:
+    """How much of each chunk the model never sees at a max_tokens window.
+
+    Returns the number of truncated chunks, tokens past the window, chars in
+    truncated tails, and non-whitespace chars of the text that no chunk
+    delivers to the model (tails not recovered by the next chunk's overlap).
+    """
+    window = max_tokens - _special_tokens(tokenizer)
+    encoded = _encode(tokenizer, list(chunks))
+
+    text = chunks.text
+    embedded = np.zeros(len(text), dtype=bool)
+    n_truncated = tokens_lost = tail_chars = 0
+    for i, (start, end) in enumerate(chunks.spans.tolist()):
+        offsets = encoded["offset_mapping"][i]
+        if len(offsets) > window:
+            n_truncated += 1
+            tokens_lost += len(offsets) - window
+            kept_end = start + offsets[window - 1][1]
+            tail_chars += end - kept_end
+            end = kept_end
+        embedded[start:end] = True
+
+    is_text = ~np.char.isspace(np.array(list(text))) if text else np.zeros(0, dtype=bool)
+    return {
+        "chunks": len(chunks),
+        "truncated": n_truncated,
+        "tokens_lost": tokens_lost,
+        "tail_chars": tail_chars,
+        "unembedded_chars": int((is_text & ~embedded).sum()),
+        "text_chars": int(is_text.sum()),
+    }
+
+
+@click.group()
+def main():
+    """Chunking reports over policies/processed/*.txt."""
+
+
+@main.command()
+@click.option("--max-tokens", default=CHUNK_MAX_TOKENS, show_default=True,
+              help="Model window, special tokens included")
+@click.option("--token-overlap", default=CHUNK_TOKEN_OVERLAP, show_default=True)
+def truncation(max_tokens: int, token_overlap: int):
+    """Report text lost to truncation with char chunks, against token chunks."""
+    from .embeddings import get_local_tokenizer
+
+    tokenizer = get_local_tokenizer()
+    paths = sorted(PROCESSED_DIR.glob("*.txt"))
+    texts = [p.read_text(encoding="utf-8") for p in paths]
+    token_chunks = make_token_chunks(texts, tokenizer, max_tokens, token_overlap)
+
+    click.echo(f"Char chunks ({CHUNK_SIZE}/{CHUNK_OVERLAP}) vs token chunks "
+               f"({max_tokens}/{token_overlap}) for {tokenizer.name_or_path}\n")
+    click.echo(f"  {'policy':<36} {'chunks':>7} {'trunc.':>7} {'tok lost':>9} "
+               f"{'unembedded':>11} {'tok chunks':>11}")
+    totals = dict.fromkeys(["chunks", "truncated", "tokens_lost", "unembedded_chars",
+                            "text_chars", "token_chunks"], 0)
+    for path, text, tchunks in zip(paths, texts, token_chunks):
+        loss = truncation_loss(make_chunks(text), tokenizer, max_tokens)
+        loss["token_chunks"] = len(tchunks)
+        for key in totals:
+            totals[key] += loss[key]
+        pct = 100 * loss["unembedded_chars"] / max(loss["text_chars"], 1)
+        click.echo(f"  {path.stem:<36} {loss['chunks']:>7} {loss['truncated']:>7} "
+                   f"{loss['tokens_lost']:>9} {pct:>10.1f}% {len(tchunks):>11}")
+
+    pct = 100 * totals["unembedded_chars"] / max(totals["text_chars"], 1)
+    click.echo(f"  {'TOTAL':<36} {totals['chunks']:>7} {totals['truncated']:>7} "
+               f"{totals['tokens_lost']:>9} {pct:>10.1f}% {totals['token_chunks']:>11}")
+
+
+@main.command()
+@click.option("--max-chars", default=CHUNK_SIZE, show_default=True)
+@click.option("--overlap", default=CHUNK_SENTENCE_OVERLAP, show_default=True,
+              help="Sentences shared by consecutive chunks")
+def sentences(max_chars: int, overlap: int):
+    """Chunk counts of sentence packing against fixed-stride char chunks."""
+    from .ingest import read_processed_file
+
+    click.echo(f"Char chunks ({CHUNK_SIZE}/{CHUNK_OVERLAP}) vs sentence chunks "
+               f"({max_chars} chars, {overlap} sentence overlap)\n")
+    click.echo(f"  {'policy':<36} {'chars':>7} {'sentences':>10} {'reduction':>10} {'mean len':>9}")
+    n_chars = n_sentences = 0
+    for path in sorted(PROCESSED_DIR.glob("*.txt")):
+        text = read_processed_file(path.stem)
+        baseline = len(chunk_spans(text))
+        chunks = make_sentence_chunks(text, max_chars, overlap)
+        n_chars += baseline
+        n_sentences += len(chunks)
+        reduction = 100 * (1 - len(chunks) / max(baseline, 1))
+        mean_len = chunks.lengths.mean() if len(chunks) else 0
+        click.echo(f"  {path.stem:<36} {baseline:>7} {len(chunks):>10} {reduction:>9.1f}% "
+                   f"{mean_len:>9.0f}")
+    reduction = 100 * (1 - n_sentences / max(n_chars, 1))
+    click.echo(f"  {'TOTAL':<36} {n_chars:>7} {n_sentences:>10} {reduction:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,28 +10,75 @@ PROJECT_ROOT = Path(__file__).parent.parent
 POLICIES_DIR = PROJECT_ROOT / "policies"
 RAW_DIR = POLICIES_DIR / "raw"
 PROCESSED_DIR = POLICIES_DIR / "processed"
+PREPROCESS_MANIFEST = PROCESSED_DIR / "manifest.json"
 METADATA_FILE = POLICIES_DIR / "metadata.json"
 WEB_DATA_DIR = PROJECT_ROOT / "web" / "data"
 FIGURES_DIR = PROJECT_ROOT / "document" / "figures" / "generated"
 CHROMA_DIR = PROJECT_ROOT / ".chroma_db"
+CACHE_DIR = PROJECT_ROOT / ".cache"
+SNAPSHOT_DIR = CACHE_DIR / "snapshots"  # memory-mapped embedding snapshots, one per collection
 
 # ── Embeddings ──
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")  # empty = api.openai.com
+OPENAI_ASYNC = os.getenv("OPENAI_ASYNC", "1") == "1"  # concurrent client instead of Chroma's
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))  # requests in flight
+OPENAI_MAX_RETRIES = 6  # per batch, on 429 / 5xx / connection errors
+OPENAI_MAX_INPUTS_PER_REQUEST = 2048
+OPENAI_MAX_TOKENS_PER_REQUEST = 300_000
 USE_LOCAL_EMBEDDINGS = os.getenv("USE_LOCAL_EMBEDDINGS", "0") == "1"
 EMBEDDING_MODEL_OPENAI = "text-embedding-3-small"
 EMBEDDING_MODEL_LOCAL = "paraphrase-multilingual-MiniLM-L12-v2"
+USE_EMBEDDING_CACHE = os.getenv("USE_EMBEDDING_CACHE", "1") == "1"
+EMBEDDING_CACHE_DIR = CACHE_DIR / "embeddings"
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # max texts per local forward pass
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "4096"))  # padded tokens per local forward pass
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))  # torch intra-op threads, 0 = torch default
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # local embedding processes, each with its own model
+EMBED_SHARD_SIZE = 256  # texts per task sent to an embedding worker
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch", "onnx" or "hash" (offline, fake)
+HASH_EMBEDDING_DIM = int(os.getenv("HASH_EMBEDDING_DIM", "384"))
+ONNX_DIR = CACHE_DIR / "onnx"
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "1") == "1"  # dynamic int8 weights
+ONNX_MIN_SPEARMAN = 0.99  # accuracy gate vs torch on the policy similarity matrix
+ONNX_MIN_COSINE = 0.98  # int8 vs fp32 vectors, checked once when the int8 model is exported
+
+# ── Preprocessing ──
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "1"))
+PREPROCESS_TIMEOUT = 600  # seconds per document in --workers mode
+PAGE_WORKERS = int(os.getenv("PAGE_WORKERS", "1"))
+PAGE_PARALLEL_MIN_PAGES = 40  # smaller PDFs aren't worth the process start-up
+USE_PAGE_CACHE = os.getenv("USE_PAGE_CACHE", "1") == "1"
+PAGE_CACHE_DIR = CACHE_DIR / "page_text"
+PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB", "256"))
 
 # ── Chunking ──
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 200
+CHUNK_MODE = os.getenv("CHUNK_MODE", "chars")  # "chars", "tokens" or "sentences"
+CHUNK_MAX_TOKENS = 128  # max_seq_length of EMBEDDING_MODEL_LOCAL, special tokens included
+CHUNK_TOKEN_OVERLAP = 32
+CHUNK_SENTENCE_OVERLAP = 0  # sentences shared by consecutive chunks in "sentences" mode
+CHUNKER_VERSION = 1  # bump when a change to chunking.py alters the chunks it produces
 
 # ── ChromaDB ──
-COLLECTION_NAME = "politicas_ia_educacion"
+COLLECTION_NAME = "politicas_ia_educacion"  # prefix; see registry.collection_name()
+CHROMA_DEFAULT_MAX_BATCH = 5000  # write batch when the client can't report its max_batch_size
+CHROMA_FETCH_PAGE = 5000  # rows per collection.get page when reading all embeddings
+
+# ── Similarity ──
+SIM_BLOCK_SIZE = 2048  # rows per block of the blocked similarity product
+SIM_MAX_IN_MEMORY_MB = int(os.getenv("SIM_MAX_IN_MEMORY_MB", "2048"))  # larger matrices go to a memmap
+SIMILARITY_MATRIX_FILE = CACHE_DIR / "similarity_matrix.f32.npy"
 
 # ── Chroma Cloud (redundancy) ──
 CHROMA_CLOUD_API_KEY = os.getenv("CHROMA_CLOUD_API_KEY", "")
 CHROMA_CLOUD_TENANT = os.getenv("CHROMA_CLOUD_TENANT", "")
 CHROMA_CLOUD_DATABASE = os.getenv("CHROMA_CLOUD_DATABASE", "public-policy")
+CHROMA_CLOUD_URL = os.getenv("CHROMA_CLOUD_URL", "")  # e.g. http://localhost:8000 (`chroma run`) in place of the cloud
+CLOUD_SYNC_WORKERS = int(os.getenv("CLOUD_SYNC_WORKERS", "2"))  # concurrent pushes to the cloud
+CLOUD_SYNC_RETRIES = 3
 
 # ── Analysis dimensions ──
 DIMENSIONS = {
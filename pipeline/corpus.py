@@ -0,0 +1,197 @@
+"""Bulk access to the chunk embeddings stored in a collection.
+
+fetch_corpus() pages through the collection once with limit/offset and
+returns every chunk vector in one contiguous float32 matrix, grouped by
+policy, so the analysis steps never query Chroma per policy.
+
+write_snapshot() stores that matrix under SNAPSHOT_DIR/<collection>/ as
+embeddings.f32.npy, chunk_offsets.npy, chunk_ids.json and manifest.json;
+load_snapshot() memory-maps it back without touching Chroma's data. The
+manifest records the collection's corpus_version (bumped by every ingest
+write) and chunk count, and a snapshot that no longer matches them is
+ignored. load_corpus() uses the snapshot when valid and rebuilds it
+otherwise.
+"""
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from .config import CHROMA_FETCH_PAGE, SNAPSHOT_DIR
+
+_MANIFEST = "manifest.json"
+
+
+class CorpusEmbeddings:
+    """All chunk vectors of a collection, grouped by policy.
+
+    vectors is a C-contiguous float32 (n_chunks, dim) matrix in which the
+    chunks of policy_ids[k] are rows offsets[k]:offsets[k + 1], in
+    chunk_index order. chunk_ids (and documents, when fetched) follow the
+    same row order.
+    """
+
+    def __init__(self, policy_ids: list[str], offsets: np.ndarray, vectors: np.ndarray,
+                 chunk_ids: list[str], documents: list[str] | None = None):
+        self.policy_ids = policy_ids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.chunk_ids = chunk_ids
+        self.documents = documents
+        self._index = {pid: k for k, pid in enumerate(policy_ids)}
+
+    def __len__(self) -> int:
+        return len(self.policy_ids)
+
+    def __contains__(self, policy_id: str) -> bool:
+        return policy_id in self._index
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def span(self, policy_id: str) -> tuple[int, int]:
+        """Row range (start, end) of a policy's chunks."""
+        k = self._index[policy_id]
+        return int(self.offsets[k]), int(self.offsets[k + 1])
+
+    def rows(self, policy_id: str) -> np.ndarray:
+        """The chunk vectors of one policy (a view, not a copy)."""
+        start, end = self.span(policy_id)
+        return self.vectors[start:end]
+
+    def centroids(self, policy_ids: list[str] | None = None) -> tuple[np.ndarray, list[str]]:
+        """Mean chunk vector of each policy, as a (n_policies, dim) float64 matrix.
+
+        Policies without stored chunks are skipped; the returned IDs give
+        the row order.
+        """
+        ids = [pid for pid in (self.policy_ids if policy_ids is None else policy_ids)
+               if pid in self._index]
+        if not ids:
+            return np.empty((0, self.dim)), ids
+        ks = np.array([self._index[pid] for pid in ids])
+        sums = np.add.reduceat(self.vectors, self.offsets[:-1], axis=0, dtype=np.float64)
+        counts = np.diff(self.offsets)
+        return sums[ks] / counts[ks, None], ids
+
+
+def fetch_corpus(collection, page_size: int = CHROMA_FETCH_PAGE,
+                 include_documents: bool = False) -> CorpusEmbeddings:
+    """Read every chunk embedding of a collection in a single paged pass."""
+    include = ["embeddings", "metadatas"] + (["documents"] if include_documents else [])
+    total = collection.count()
+    vectors = None
+    chunk_ids, policies, chunk_index, documents = [], [], [], []
+
+    for offset in range(0, total, page_size):
+        page = collection.get(limit=page_size, offset=offset, include=include)
+        if not page["ids"]:
+            break
+        embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+        if vectors is None:
+            vectors = np.empty((total, embeddings.shape[1]), dtype=np.float32)
+        vectors[len(chunk_ids):len(chunk_ids) + len(embeddings)] = embeddings
+        chunk_ids.extend(page["ids"])
+        for meta in page["metadatas"]:
+            policies.append(meta["policy_id"])
+            chunk_index.append(meta.get("chunk_index", 0))
+        if include_documents:
+            documents.extend(page["documents"])
+
+    n = len(chunk_ids)
+    if vectors is None:
+        return CorpusEmbeddings([], np.zeros(1, dtype=np.int64), np.empty((0, 0), np.float32),
+                                [], [] if include_documents else None)
+
+    # Group rows by policy (in order of first appearance), then by chunk_index
+    code_of: dict[str, int] = {}
+    codes = np.array([code_of.setdefault(p, len(code_of)) for p in policies], dtype=np.int64)
+    policy_ids = list(code_of)
+    order = np.lexsort((np.array(chunk_index), codes))
+    counts = np.bincount(codes, minlength=len(policy_ids))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return CorpusEmbeddings(
+        policy_ids, offsets, np.ascontiguousarray(vectors[:n][order]),
+        [chunk_ids[i] for i in order],
+        [documents[i] for i in order] if include_documents else None,
+    )
+
+
+def corpus_version(collection) -> str:
+    """Version token of a collection's contents ("" if never bumped)."""
+    return str((collection.metadata or {}).get("corpus_version", ""))
+
+
+def bump_corpus_version(collection):
+    """Mark the collection's contents as changed, invalidating its snapshot."""
+    collection.modify(metadata={**(collection.metadata or {}),
+                                "corpus_version": uuid.uuid4().hex})
+
+
+def snapshot_dir(collection, root: Path = SNAPSHOT_DIR) -> Path:
+    return Path(root) / collection.name
+
+
+def _replace(path: Path, write):
+    """Write a file through a temporary name, so readers never see it half-written."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def write_snapshot(corpus: CorpusEmbeddings, collection, root: Path = SNAPSHOT_DIR) -> Path:
+    """Store corpus as the memory-mappable snapshot of collection; returns its directory."""
+    directory = snapshot_dir(collection, root)
+    directory.mkdir(parents=True, exist_ok=True)
+    # The manifest goes first and last: without it the arrays are never trusted
+    (directory / _MANIFEST).unlink(missing_ok=True)
+    _replace(directory / "embeddings.f32.npy",
+             lambda f: np.save(f, np.ascontiguousarray(corpus.vectors, dtype=np.float32)))
+    _replace(directory / "chunk_offsets.npy", lambda f: np.save(f, corpus.offsets))
+    _replace(directory / "chunk_ids.json",
+             lambda f: f.write(json.dumps(corpus.chunk_ids).encode("utf-8")))
+    manifest = {
+        "collection": collection.name,
+        "corpus_version": corpus_version(collection),
+        "count": len(corpus.chunk_ids),
+        "dim": corpus.dim if len(corpus.chunk_ids) else 0,
+        "policy_ids": corpus.policy_ids,
+        "collection_metadata": collection.metadata or {},
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    _replace(directory / _MANIFEST,
+             lambda f: f.write(json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8")))
+    return directory
+
+
+def load_snapshot(collection, root: Path = SNAPSHOT_DIR) -> CorpusEmbeddings | None:
+    """Memory-mapped snapshot of collection, or None if missing or out of date."""
+    directory = snapshot_dir(collection, root)
+    try:
+        manifest = json.loads((directory / _MANIFEST).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if (manifest["corpus_version"] != corpus_version(collection)
+            or manifest["count"] != collection.count()):
+        return None
+    return CorpusEmbeddings(
+        manifest["policy_ids"],
+        np.load(directory / "chunk_offsets.npy"),
+        # An empty file can't be memory-mapped
+        np.load(directory / "embeddings.f32.npy", mmap_mode="r" if manifest["count"] else None),
+        json.loads((directory / "chunk_ids.json").read_text(encoding="utf-8")),
+    )
+
+
+def load_corpus(collection, root: Path = SNAPSHOT_DIR) -> CorpusEmbeddings:
+    """The collection's embeddings from its snapshot, refreshing a stale one first."""
+    corpus = load_snapshot(collection, root)
+    if corpus is None:
+        corpus = fetch_corpus(collection)
+        write_snapshot(corpus, collection, root)
+    return corpus
@@ -0,0 +1,280 @@
+"""Persistent, content-addressed cache of embedding vectors.
+
+Vectors are keyed by (model name, hash of the whitespace- and
+NFC-normalized text). Each model gets a directory under EMBEDDING_CACHE_DIR
+with a float32 memory-mapped matrix (vectors.f32) and an index (index.npz)
+mapping keys to rows and last-use ticks. When the matrix reaches
+EMBEDDING_CACHE_MAX_MB the least recently used rows are evicted.
+
+Cache hits only update the in-memory ticks: save() rewrites the index when
+entries were added or evicted, or after _RECENCY_SAVE_HITS unsaved hits,
+so a fully cached run does not rewrite index.npz on every call.
+
+The cache assumes a single writer: one pipeline process at a time.
+"""
+import hashlib
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from .config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_MB
+
+_KEY_BYTES = 16
+_MIN_CAPACITY = 1024
+_EVICT_FRACTION = 0.1  # evict at least this share of the cap at once
+_RECENCY_SAVE_HITS = 100_000  # rewrite the index for recency alone after this many hits
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace-collapsed NFC form of text, as hashed for cache keys."""
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+def text_key(text: str) -> bytes:
+    """Content hash of the normalized text."""
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=_KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    """float32 vectors of one model in a memmap, with an LRU index."""
+
+    def __init__(self, model_name: str, root: Path = EMBEDDING_CACHE_DIR,
+                 max_bytes: int = EMBEDDING_CACHE_MAX_MB * 2**20):
+        self.model_name = model_name
+        self.dir = Path(root) / re.sub(r"[^\w.-]+", "_", model_name)
+        self.max_bytes = max_bytes
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        self._vectors = None
+        self._rows: dict[bytes, int] = {}
+        self._ticks: dict[bytes, int] = {}
+        self._free: list[int] = []
+        self._tick = 0
+        self._dirty = False
+        self._unsaved_hits = 0
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.dir / "vectors.f32"
+
+    @property
+    def _index_path(self) -> Path:
+        return self.dir / "index.npz"
+
+    @property
+    def max_rows(self) -> int:
+        return max(1, self.max_bytes // (4 * self.dim))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load(self):
+        if not self._index_path.exists() or not self._vectors_path.exists():
+            return
+        index = np.load(self._index_path)
+        if str(index["model"]) != self.model_name:
+            return
+        self.dim = int(index["dim"])
+        self._tick = int(index["tick"])
+        keys = [key.tobytes() for key in index["keys"]]
+        self._rows = dict(zip(keys, index["rows"].tolist()))
+        self._ticks = dict(zip(keys, index["ticks"].tolist()))
+        self._open(self._vectors_path.stat().st_size // (4 * self.dim))
+        used = set(self._rows.values())
+        self._free = [row for row in range(len(self._vectors) - 1, -1, -1) if row not in used]
+
+    def _open(self, n_rows: int):
+        """(Re)open the memmap with n_rows rows, growing the file if needed."""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        self.dir.mkdir(parents=True, exist_ok=True)
+        size = n_rows * self.dim * 4
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(n_rows, self.dim))
+
+    def get(self, keys: list[bytes]) -> list[np.ndarray | None]:
+        """Cached vector (a copy) for each key, or None; marks hits as recently used."""
+        self._tick += 1
+        result = []
+        for key in keys:
+            row = self._rows.get(key)
+            if row is None:
+                result.append(None)
+                self.misses += 1
+            else:
+                result.append(np.array(self._vectors[row]))
+                self._ticks[key] = self._tick
+                self.hits += 1
+                self._unsaved_hits += 1
+        return result
+
+    def _reserve(self, n: int) -> list[int]:
+        """Free rows for n new vectors, growing the file or evicting LRU rows."""
+        if len(self._free) < n:
+            current = 0 if self._vectors is None else len(self._vectors)
+            target = min(self.max_rows, max(2 * current, current + n, _MIN_CAPACITY))
+            if target > current:
+                self._open(target)
+                self._free[:0] = range(target - 1, current - 1, -1)
+        if len(self._free) < n:
+            n_evict = min(len(self._rows),
+                          max(n - len(self._free), int(self.max_rows * _EVICT_FRACTION)))
+            victims = sorted(self._ticks, key=self._ticks.get)[:n_evict]
+            for key in victims:
+                self._free.append(self._rows.pop(key))
+                del self._ticks[key]
+            # Persist the eviction before the rows are overwritten
+            self._dirty = True
+            self.save()
+        n = min(n, len(self._free))
+        rows = self._free[-n:] if n else []
+        del self._free[len(self._free) - n:]
+        return rows
+
+    def put(self, keys: list[bytes], vectors: np.ndarray):
+        """Store vectors (one row per key); keys already cached are skipped."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d vectors for {self.model_name}, "
+                             f"got {vectors.shape[1]}")
+
+        new = {}
+        for key, vector in zip(keys, vectors):
+            if key not in self._rows:
+                new.setdefault(key, vector)
+        # More vectors than the cap: keep only the last ones
+        items = list(new.items())[-self.max_rows:]
+        rows = self._reserve(len(items))
+        for row, (key, vector) in zip(rows, items):
+            self._vectors[row] = vector
+            self._rows[key] = row
+            self._ticks[key] = self._tick
+        self._dirty = self._dirty or bool(rows)
+
+    def save(self):
+        """Flush vectors and atomically rewrite the index, if entries changed."""
+        if self.dim is None or not (self._dirty or self._unsaved_hits >= _RECENCY_SAVE_HITS):
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        keys = list(self._rows)
+        tmp = self._index_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                model=np.array(self.model_name),
+                dim=np.array(self.dim),
+                tick=np.array(self._tick),
+                keys=np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(-1, _KEY_BYTES),
+                rows=np.array([self._rows[k] for k in keys], dtype=np.int64),
+                ticks=np.array([self._ticks[k] for k in keys], dtype=np.int64),
+            )
+        os.replace(tmp, self._index_path)
+        self._dirty = False
+        self._unsaved_hits = 0
+
+
+class PartialEmbeddingError(RuntimeError):
+    """An embedding call failed after embedding some inputs.
+
+    vectors maps input positions to the vectors that did succeed, so callers
+    can keep them instead of sending those inputs again.
+    """
+
+    def __init__(self, vectors: dict[int, np.ndarray], cause: BaseException):
+        super().__init__(f"embedding failed after {len(vectors)} inputs: {cause}")
+        self.vectors = vectors
+        self.cause = cause
+
+
+@lru_cache(maxsize=None)
+def get_cache(model_name: str) -> EmbeddingCache:
+    """Process-wide EmbeddingCache of a model (one instance per store)."""
+    return EmbeddingCache(model_name)
+
+
+@lru_cache(maxsize=1)
+def chroma_wants_lists() -> bool:
+    """chromadb < 0.5 validates embeddings as lists of floats, later as arrays."""
+    try:
+        import chromadb
+    except ImportError:
+        return False
+    major, minor = (int(part) for part in chromadb.__version__.split(".")[:2])
+    return (major, minor) < (0, 5)
+
+
+class CachedEmbeddingFunction:
+    """ChromaDB embedding function that only embeds texts missing from the cache.
+
+    make_fn builds the wrapped embedding function; it is called on the first
+    cache miss (or attribute access), so a fully cached run never loads the
+    model. Other attributes (name, get_config, ...) are delegated to it.
+    """
+
+    def __init__(self, make_fn, model_name: str, cache: EmbeddingCache | None = None):
+        self._make_fn = make_fn
+        self._fn = None
+        self.model_name = model_name
+        self.cache = cache if cache is not None else get_cache(model_name)
+        self.forward_calls = 0
+
+    @property
+    def embedding_fn(self):
+        if self._fn is None:
+            self._fn = self._make_fn()
+        return self._fn
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.embedding_fn, name)
+
+    def __call__(self, input):
+        texts = list(input)
+        keys = [text_key(t) for t in texts]
+        found = self.cache.get(keys)
+
+        missing = {}
+        for i, (key, vector) in enumerate(zip(keys, found)):
+            if vector is None:
+                missing.setdefault(key, i)
+        if missing:
+            self.forward_calls += 1
+            try:
+                computed = np.asarray(
+                    self.embedding_fn([texts[i] for i in missing.values()]), dtype=np.float32
+                )
+            except PartialEmbeddingError as e:
+                # Keep what succeeded so a retry only embeds the rest
+                missing_keys = list(missing)
+                done = sorted(e.vectors)
+                if done:
+                    self.cache.put([missing_keys[i] for i in done],
+                                   np.stack([e.vectors[i] for i in done]))
+                    self.cache.save()
+                raise
+            self.cache.put(list(missing), computed)
+            by_key = dict(zip(missing, computed))
+            found = [by_key[key] if vector is None else vector
+                     for key, vector in zip(keys, found)]
+        self.cache.save()
+        if chroma_wants_lists():
+            return [vector.tolist() for vector in found]
+        return found
+
+    def embed_query(self, input):
+        return self(input)
@@ -1,19 +1,93 @@
 """Embedding functions for the pipeline."""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
 from .config import (
-    OPENAI_API_KEY, USE_LOCAL_EMBEDDINGS,
+    OPENAI_API_KEY, OPENAI_ASYNC, USE_LOCAL_EMBEDDINGS, USE_EMBEDDING_CACHE,
     EMBEDDING_MODEL_OPENAI, EMBEDDING_MODEL_LOCAL,
+    EMBED_BATCH_SIZE, EMBED_BATCH_TOKENS, EMBED_THREADS, EMBED_WORKERS, EMBED_SHARD_SIZE,
+    EMBEDDING_BACKEND, ONNX_DIR, ONNX_QUANTIZE, ONNX_MIN_COSINE, ONNX_MIN_SPEARMAN,
+    HASH_EMBEDDING_DIM,
 )
+from .embedding_cache import CachedEmbeddingFunction, text_key
+from .registry import get_or_load
+
 
+def get_embedding_function(workers: int = EMBED_WORKERS):
+    """Return the appropriate embedding function based on configuration.
 
-def get_embedding_function():
-    """Return the appropriate embedding function based on configuration."""
+    With USE_EMBEDDING_CACHE the function is wrapped in the persistent
+    embedding cache, so text embedded before is never embedded again.
+    workers > 1 spreads local embedding over an EmbeddingPool. Models are
+    shared through the process-wide registry. EMBEDDING_BACKEND=hash returns
+    the offline HashEmbeddingFunction, uncached.
+    """
+    if EMBEDDING_BACKEND == "hash":
+        return HashEmbeddingFunction()
     if USE_LOCAL_EMBEDDINGS or not OPENAI_API_KEY:
-        return _get_local_embedding_function()
-    return _get_openai_embedding_function()
+        model_name = local_cache_name(EMBEDDING_BACKEND)
+        if workers > 1:
+            factory = lambda: EmbeddingPool(workers, backend=EMBEDDING_BACKEND)  # noqa: E731
+        else:
+            factory = _get_local_embedding_function
+    else:
+        factory, model_name = _get_openai_embedding_function, EMBEDDING_MODEL_OPENAI
+
+    # The model itself is loaded once per process, on first use
+    def make_fn():
+        return get_or_load(("embedding", model_name, f"workers={workers}"), factory)
+
+    if USE_EMBEDDING_CACHE:
+        return CachedEmbeddingFunction(make_fn, model_name)
+    return make_fn()
+
+
+def embedding_model_name() -> str:
+    """Identity of the vectors get_embedding_function() produces."""
+    if EMBEDDING_BACKEND == "hash":
+        return f"hash-{HASH_EMBEDDING_DIM}"
+    if USE_LOCAL_EMBEDDINGS or not OPENAI_API_KEY:
+        return local_cache_name(EMBEDDING_BACKEND)
+    return EMBEDDING_MODEL_OPENAI
+
+
+class HashEmbeddingFunction:
+    """Reproducible pseudo-random unit vectors seeded from a hash of each text.
+
+    Needs no model or network and costs microseconds per text, so pipeline
+    runs with it measure Chroma, NumPy and I/O time only. Equal normalized
+    texts get equal vectors; the vectors carry no meaning.
+    """
+
+    def __init__(self, dim: int = HASH_EMBEDDING_DIM):
+        self.dim = dim
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        # SHAKE-256 of the text key stretched to dim uniform 32-bit values per text
+        n_bytes = 4 * self.dim
+        raw = b"".join(hashlib.shake_256(text_key(t)).digest(n_bytes) for t in texts)
+        vectors = np.frombuffer(raw, dtype="<u4").reshape(len(texts), self.dim)
+        vectors = vectors.astype(np.float32) / np.float32(2**31) - np.float32(1)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return list(vectors)
 
 
 def _get_openai_embedding_function():
     """OpenAI embedding function for ChromaDB."""
+    if OPENAI_ASYNC:
+        from .openai_embeddings import AsyncOpenAIEmbeddingFunction
+        return AsyncOpenAIEmbeddingFunction()
+
     from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
 
     return OpenAIEmbeddingFunction(
@@ -23,9 +97,370 @@ def _get_openai_embedding_function():
 
 
 def _get_local_embedding_function():
-    """Local sentence-transformers embedding function for ChromaDB."""
-    from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+    """Local embedding function of the configured EMBEDDING_BACKEND."""
+    return make_local_backend(EMBEDDING_BACKEND)
 
-    return SentenceTransformerEmbeddingFunction(
-        model_name=EMBEDDING_MODEL_LOCAL,
-    )
+
+def make_local_backend(backend: str = EMBEDDING_BACKEND, model_name: str = EMBEDDING_MODEL_LOCAL,
+                       threads: int = EMBED_THREADS):
+    """Local embedding function for a backend name ("torch", "onnx" or "hash")."""
+    if backend == "torch":
+        return LocalEmbeddingFunction(model_name, threads=threads)
+    if backend == "onnx":
+        return OnnxEmbeddingFunction(model_name, threads=threads)
+    if backend == "hash":
+        return HashEmbeddingFunction()
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r} (expected 'torch', 'onnx' or 'hash')")
+
+
+def local_cache_name(backend: str = EMBEDDING_BACKEND, quantize: bool = ONNX_QUANTIZE) -> str:
+    """Embedding cache model name; ONNX vectors are cached apart from torch ones."""
+    if backend == "onnx":
+        return f"{EMBEDDING_MODEL_LOCAL}@onnx{'-int8' if quantize else ''}"
+    return EMBEDDING_MODEL_LOCAL
+
+
+def token_budget_batches(lengths, batch_tokens: int = EMBED_BATCH_TOKENS,
+                         max_batch_size: int = EMBED_BATCH_SIZE) -> list[np.ndarray]:
+    """Group input indices into batches of similar token length.
+
+    Inputs are sorted by length; a batch grows while its padded size
+    (batch size x longest input) stays within batch_tokens and it holds at
+    most max_batch_size inputs. Returns index arrays into the original order.
+    """
+    lengths = np.asarray(lengths)
+    order = np.argsort(lengths, kind="stable")
+    batches, start = [], 0
+    for end in range(1, len(order) + 1):
+        if end == len(order):
+            batches.append(order[start:end])
+            break
+        size = end + 1 - start
+        if size > max_batch_size or size * lengths[order[end]] > batch_tokens:
+            batches.append(order[start:end])
+            start = end
+    return batches
+
+
+class LocalEmbeddingFunction:
+    """sentence-transformers backend with length-sorted, token-budgeted batches.
+
+    Produces the same vectors as ChromaDB's SentenceTransformerEmbeddingFunction
+    (no normalization) but pads each forward pass only to the longest input
+    of a batch of similar lengths.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_LOCAL,
+                 batch_tokens: int = EMBED_BATCH_TOKENS,
+                 max_batch_size: int = EMBED_BATCH_SIZE,
+                 threads: int = EMBED_THREADS, device: str | None = None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device=device)
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+
+    def token_lengths(self, texts: list[str]) -> np.ndarray:
+        """Tokens per text as the model sees it (special tokens, truncation)."""
+        encoded = self.model.tokenizer(
+            texts, add_special_tokens=True, truncation=True,
+            max_length=self.model.max_seq_length, return_attention_mask=False,
+        )
+        return np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64,
+                           count=len(texts))
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        out = np.empty((len(texts), self.model.get_sentence_embedding_dimension()),
+                       dtype=np.float32)
+        for batch in token_budget_batches(self.token_lengths(texts), self.batch_tokens,
+                                          self.max_batch_size):
+            out[batch] = self.model.encode(
+                [texts[i] for i in batch], batch_size=len(batch),
+                convert_to_numpy=True, show_progress_bar=False,
+            )
+        return list(out)
+
+
+# ── ONNX Runtime backend ──
+
+# Sample inputs for the int8 accuracy check, in the corpus languages
+_QUANTIZE_CHECK_TEXTS = [
+    "Política nacional de inteligencia artificial para la educación superior.",
+    "Los docentes recibirán formación en el uso ético de herramientas de IA.",
+    "Estratégia brasileira de inteligência artificial e proteção de dados pessoais.",
+    "As escolas devem garantir o acesso equitativo às tecnologias digitais.",
+    "The framework sets out principles for the responsible use of AI in schools.",
+    "Generative AI tools must not replace teacher judgement in assessment.",
+    "Les établissements doivent protéger les données des élèves face aux outils d'IA.",
+    "Universities should update curricula to include data literacy and AI ethics.",
+]
+
+
+def _onnx_session(path: Path, threads: int = 0):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+
+
+def _mean_pooled(session, tokenizer, texts: list[str], max_length: int) -> np.ndarray:
+    """Mean of the session's last hidden state over the attention mask."""
+    encoded = tokenizer(texts, padding=True, truncation=True,
+                        max_length=max_length, return_tensors="np")
+    input_names = {i.name for i in session.get_inputs()}
+    feed = {name: encoded[name].astype(np.int64) for name in input_names}
+    hidden = session.run(["last_hidden_state"], feed)[0]
+    mask = encoded["attention_mask"][..., None].astype(np.float32)
+    return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+def check_quantized(model_name: str, fp32_path: Path, int8_path: Path,
+                    min_cosine: float = ONNX_MIN_COSINE,
+                    min_spearman: float = ONNX_MIN_SPEARMAN) -> dict:
+    """Compare int8 and fp32 vectors of sample texts.
+
+    Returns the lowest per-text cosine and the Spearman correlation of the
+    two pairwise similarity matrices; raises RuntimeError if either falls
+    below its threshold.
+    """
+    from scipy.stats import spearmanr
+
+    tokenizer = get_local_tokenizer(model_name)
+    max_length = local_max_seq_length(model_name)
+    fp32, int8 = (_mean_pooled(_onnx_session(path), tokenizer, _QUANTIZE_CHECK_TEXTS, max_length)
+                  for path in (fp32_path, int8_path))
+    fp32 = fp32 / np.linalg.norm(fp32, axis=1, keepdims=True)
+    int8 = int8 / np.linalg.norm(int8, axis=1, keepdims=True)
+    upper = np.triu_indices(len(fp32), k=1)
+    result = {
+        "cosine": float((fp32 * int8).sum(axis=1).min()),
+        "spearman": float(spearmanr((fp32 @ fp32.T)[upper], (int8 @ int8.T)[upper]).correlation),
+    }
+    if result["cosine"] < min_cosine or result["spearman"] < min_spearman:
+        raise RuntimeError(
+            f"int8 ONNX model of {model_name} is too far from fp32 (cosine "
+            f"{result['cosine']:.4f}, min {min_cosine}; Spearman {result['spearman']:.4f}, "
+            f"min {min_spearman}); set ONNX_QUANTIZE=0 to use the fp32 export"
+        )
+    return result
+
+
+def _accept_quantized(model_name: str, fp32_path: Path, int8_path: Path, record_path: Path):
+    """Run check_quantized on int8_path, deleting the file if it fails.
+
+    The result is recorded next to the model with the thresholds it passed,
+    so a model checked under older thresholds is checked again.
+    """
+    try:
+        result = check_quantized(model_name, fp32_path, int8_path)
+    except Exception:
+        int8_path.unlink(missing_ok=True)
+        raise
+    record = {"min_cosine": ONNX_MIN_COSINE, "min_spearman": ONNX_MIN_SPEARMAN, **result}
+    record_path.write_text(json.dumps(record), encoding="utf-8")
+
+
+def _quantized_accepted(record_path: Path) -> bool:
+    try:
+        record = json.loads(record_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return (record.get("min_cosine") == ONNX_MIN_COSINE
+            and record.get("min_spearman") == ONNX_MIN_SPEARMAN)
+
+
+def export_onnx(model_name: str = EMBEDDING_MODEL_LOCAL, quantize: bool = ONNX_QUANTIZE,
+                out_dir: Path = ONNX_DIR) -> Path:
+    """Export the model's transformer to ONNX once (int8-quantized if asked).
+
+    A quantized model is only used once check_quantized() has accepted it
+    under the current thresholds. Returns the path of the exported model;
+    later calls reuse the file.
+    """
+    target = Path(out_dir) / re.sub(r"[^\w.-]+", "_", model_name)
+    fp32_path = target / "model.onnx"
+    path = target / "model.int8.onnx" if quantize else fp32_path
+    record_path = target / "model.int8.check.json"
+    if path.exists():
+        if quantize and not _quantized_accepted(record_path):
+            _accept_quantized(model_name, fp32_path, path, record_path)
+        return path
+
+    target.mkdir(parents=True, exist_ok=True)
+    if not fp32_path.exists():
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        sample = st_model.tokenizer(["Política de inteligencia artificial"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids")
+                       if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"}
+                        for name in input_names + ["last_hidden_state"]}
+        tmp = fp32_path.with_suffix(".tmp")
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer, tuple(sample[name] for name in input_names), str(tmp),
+                input_names=input_names, output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes, opset_version=14,
+            )
+        os.replace(tmp, fp32_path)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp = path.with_suffix(".tmp")
+        quantize_dynamic(str(fp32_path), str(tmp), weight_type=QuantType.QInt8)
+        _accept_quantized(model_name, fp32_path, tmp, record_path)
+        os.replace(tmp, path)
+    return path
+
+
+class OnnxEmbeddingFunction:
+    """Local model served by ONNX Runtime, with the same batching as the torch backend.
+
+    Mean-pools the exported transformer's last hidden state over the
+    attention mask, as the sentence-transformers pipeline of
+    EMBEDDING_MODEL_LOCAL does.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_LOCAL, quantize: bool = ONNX_QUANTIZE,
+                 batch_tokens: int = EMBED_BATCH_TOKENS, max_batch_size: int = EMBED_BATCH_SIZE,
+                 threads: int = EMBED_THREADS, max_length: int | None = None):
+        self.path = export_onnx(model_name, quantize)
+        self.session = _onnx_session(self.path, threads)
+        self.tokenizer = get_local_tokenizer(model_name)
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length or local_max_seq_length(model_name)
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        return _mean_pooled(self.session, self.tokenizer, texts, self.max_length)
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length,
+                                 return_attention_mask=False)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        out = None
+        for batch in token_budget_batches(lengths, self.batch_tokens, self.max_batch_size):
+            vectors = self._encode([texts[i] for i in batch])
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[batch] = vectors
+        return list(out)
+
+
+# ── Multi-process local embedding ──
+
+_worker_fn = None
+
+
+def _init_pool_worker(backend: str, model_name: str, threads: int):
+    """Load a private model copy with a pinned intra-op thread count."""
+    global _worker_fn
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    _worker_fn = make_local_backend(backend, model_name, threads)
+
+
+def _embed_shard(texts: list[str]) -> np.ndarray:
+    return np.stack(_worker_fn(texts))
+
+
+class EmbeddingPool:
+    """Local embedding sharded across worker processes.
+
+    Each of the `workers` processes (spawned on first use) holds its own
+    local backend with `threads` intra-op threads, by default an
+    equal share of the CPU cores. Inputs are cut into contiguous shards of
+    at most shard_size texts and results are gathered in input order.
+    """
+
+    def __init__(self, workers: int = EMBED_WORKERS, threads: int | None = None,
+                 shard_size: int = EMBED_SHARD_SIZE, model_name: str = EMBEDDING_MODEL_LOCAL,
+                 backend: str = EMBEDDING_BACKEND):
+        self.workers = workers
+        self.backend = backend
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.shard_size = shard_size
+        self.model_name = model_name
+        self._pool = None
+
+    def start(self):
+        """Spawn the workers and load their models (otherwise done on first call)."""
+        if self._pool is None:
+            ctx = multiprocessing.get_context("spawn")
+            self._pool = ctx.Pool(self.workers, initializer=_init_pool_worker,
+                                  initargs=(self.backend, self.model_name, self.threads))
+        return self
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        # Small inputs still get one shard per worker
+        size = max(1, min(self.shard_size, -(-len(texts) // self.workers)))
+        shards = [texts[i:i + size] for i in range(0, len(texts), size)]
+        results = self.start()._pool.map(_embed_shard, shards, chunksize=1)
+        return list(np.concatenate(results))
+
+
+def _hub_name(model_name: str) -> str:
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+@lru_cache(maxsize=None)
+def get_local_tokenizer(model_name: str = EMBEDDING_MODEL_LOCAL):
+    """Fast (Rust) tokenizer of a local sentence-transformers model."""
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(_hub_name(model_name), use_fast=True)
+
+
+@lru_cache(maxsize=None)
+def local_max_seq_length(model_name: str = EMBEDDING_MODEL_LOCAL) -> int:
+    """Tokens a local model reads per text, as SentenceTransformer.max_seq_length.
+
+    Taken from the model's sentence_bert_config.json, else from the
+    tokenizer and transformer limits, so the ONNX backend truncates
+    where the torch one does.
+    """
+    from huggingface_hub import hf_hub_download
+
+    try:
+        path = hf_hub_download(_hub_name(model_name), "sentence_bert_config.json")
+        with open(path, encoding="utf-8") as f:
+            return int(json.load(f)["max_seq_length"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    from transformers import AutoConfig
+
+    limits = [get_local_tokenizer(model_name).model_max_length,
+              getattr(AutoConfig.from_pretrained(_hub_name(model_name)),
+                      "max_position_embeddings", None)]
+    return int(min(limit for limit in limits if limit))
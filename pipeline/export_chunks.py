@@ -4,25 +4,11 @@ import numpy as np
 from pathlib import Path
 from scipy.spatial.distance import cosine
 
-from .config import (
-    DIMENSIONS, WEB_DATA_DIR, PROCESSED_DIR,
-    CHUNK_SIZE, CHUNK_OVERLAP,
-)
-from .similarity import get_collection
+from .config import DIMENSIONS, WEB_DATA_DIR, PROCESSED_DIR
+from .corpus import fetch_corpus
+from .similarity import dimension_matrix, get_collection
 from .embeddings import get_embedding_function
-
-
-def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
-    """Split text into overlapping chunks."""
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        if chunk.strip():
-            chunks.append(chunk.strip())
-        start += chunk_size - overlap
-    return chunks
+from .chunking import chunk_document
 
 
 def get_dominant_dimension(embedding, dim_embeddings: dict) -> str:
@@ -69,14 +55,13 @@ def export_chunk_pairs(similarity_threshold: float = 0.70, top_k: int = 5):
             json.dump(output, f, ensure_ascii=False)
         return
 
-    # Get ChromaDB collection
-    collection = get_collection()
+    # All stored chunks and embeddings, read from ChromaDB in one pass
+    corpus = fetch_corpus(get_collection(), include_documents=True)
     embedding_fn = get_embedding_function()
 
     # Compute dimension embeddings
-    dim_embeddings = {}
-    for dim_key, dim_info in DIMENSIONS.items():
-        dim_embeddings[dim_key] = np.array(embedding_fn([dim_info["query"]])[0])
+    queries, dim_keys = dimension_matrix(DIMENSIONS, embedding_fn)
+    dim_embeddings = dict(zip(dim_keys, queries))
 
     # Cache: policy_id -> list of (chunk_text, embedding)
     chunk_cache = {}
@@ -92,26 +77,18 @@ def export_chunk_pairs(similarity_threshold: float = 0.70, top_k: int = 5):
             chunk_cache[policy_id] = []
             return []
 
-        text = txt_path.read_text(encoding="utf-8")
-        chunks = chunk_text(text)
-
-        # Get embeddings from ChromaDB
-        results_db = collection.get(
-            where={"policy_id": policy_id},
-            include=["embeddings", "documents"],
-        )
+        chunks = chunk_document(txt_path.read_text(encoding="utf-8"))
 
-        if not results_db["embeddings"] or len(results_db["embeddings"]) == 0:
+        if policy_id not in corpus:
             # Fall back to computing embeddings from chunks
             print(f"  Computing embeddings for {policy_id} ({len(chunks)} chunks)...")
-            embeddings = embedding_fn(chunks[:200])  # limit to 200 chunks
-            chunk_data = list(zip(chunks[:200], embeddings))
+            sample = chunks[:200]  # limit to 200 chunks
+            embeddings = embedding_fn(sample)
+            chunk_data = list(zip(sample, embeddings))
         else:
             # Use stored chunks and embeddings
-            chunk_data = list(zip(
-                results_db["documents"],
-                results_db["embeddings"],
-            ))
+            start, end = corpus.span(policy_id)
+            chunk_data = list(zip(corpus.documents[start:end], corpus.vectors[start:end]))
 
         chunk_cache[policy_id] = chunk_data
         return chunk_data
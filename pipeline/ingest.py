@@ -1,17 +1,26 @@
 """Ingesta de documentos de política al ChromaDB."""
+import hashlib
 import json
+import queue
+import threading
+import time
 import click
-from pathlib import Path
+import numpy as np
 from tqdm import tqdm
 
 from .config import (
-    RAW_DIR, PROCESSED_DIR, METADATA_FILE, CHROMA_DIR,
-    COLLECTION_NAME, CHUNK_SIZE, CHUNK_OVERLAP,
-    OPENAI_API_KEY, USE_LOCAL_EMBEDDINGS,
-    EMBEDDING_MODEL_OPENAI, EMBEDDING_MODEL_LOCAL,
-    CHROMA_CLOUD_API_KEY, CHROMA_CLOUD_TENANT, CHROMA_CLOUD_DATABASE,
+    PROCESSED_DIR, METADATA_FILE, CHUNK_SIZE, CHUNK_OVERLAP, COLLECTION_NAME,
+    EMBED_WORKERS, CHROMA_DEFAULT_MAX_BATCH, CLOUD_SYNC_WORKERS, CLOUD_SYNC_RETRIES,
 )
+from .corpus import bump_corpus_version, load_corpus, snapshot_dir
 from .embeddings import get_embedding_function
+from .embedding_cache import chroma_wants_lists
+from .registry import (
+    cloud_configured, collection_metadata, collection_name, get_chroma_client,
+    get_chroma_cloud_client, load_times,
+)
+from .chunking import Chunks, chunk_document, chunk_ids, make_chunks
+from .preprocess import load_page_offsets, page_for_offset
 
 
 def load_metadata():
@@ -23,16 +32,29 @@ def load_metadata():
 
 
 def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
-    """Split text into overlapping chunks."""
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        if chunk.strip():
-            chunks.append(chunk.strip())
-        start += chunk_size - overlap
-    return chunks
+    """Split text into overlapping chunks (materialized; see chunking.make_chunks)."""
+    return list(make_chunks(text, chunk_size, overlap))
+
+
+def chunk_metadatas(policy_id: str, policy: dict, chunks: Chunks) -> list[dict]:
+    """ChromaDB metadata for each chunk, with its char offset and, when a page index exists, its PDF page."""
+    offsets = load_page_offsets(policy_id)
+    starts = chunks.starts.tolist()
+    metadatas = []
+    for i in range(len(chunks)):
+        meta = {
+            "policy_id": policy_id,
+            "country": policy.get("country", ""),
+            "region": policy.get("region", ""),
+            "year": policy.get("year", 0),
+            "language": policy.get("language", ""),
+            "chunk_index": i,
+            "char_start": starts[i],
+        }
+        if offsets is not None:
+            meta["page"] = page_for_offset(offsets, starts[i])
+        metadatas.append(meta)
+    return metadatas
 
 
 def read_processed_file(policy_id: str) -> str:
@@ -43,116 +65,485 @@ def read_processed_file(policy_id: str) -> str:
     raise FileNotFoundError(f"No processed file found for {policy_id}")
 
 
-def ingest_policy(policy_id: str, collection):
+def content_hash(document: str) -> str:
+    """Hash of a chunk's exact text, stored in its metadata to detect edits."""
+    return hashlib.blake2b(document.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def prepare_policy(policy_id: str, policy: dict, text: str) -> dict:
+    """Chunks of one policy with their IDs and metadata, ready to embed."""
+    chunks = chunk_document(text)
+    documents = list(chunks)
+    metadatas = chunk_metadatas(policy_id, policy, chunks)
+    for document, meta in zip(documents, metadatas):
+        meta["content_hash"] = content_hash(document)
+    return {
+        "policy_id": policy_id,
+        "ids": chunk_ids(policy_id, len(chunks)),
+        "documents": documents,
+        "metadatas": metadatas,
+    }
+
+
+def select_chunks(prepared: dict, indices: list[int]) -> dict:
+    """The chunks of a prepared policy at `indices` (vectors included, if embedded)."""
+    entry = {
+        "policy_id": prepared["policy_id"],
+        "indices": [prepared.get("indices", range(len(prepared["ids"])))[i] for i in indices],
+        "ids": [prepared["ids"][i] for i in indices],
+        "documents": [prepared["documents"][i] for i in indices],
+        "metadatas": [prepared["metadatas"][i] for i in indices],
+    }
+    if "embeddings" in prepared:
+        entry["embeddings"] = prepared["embeddings"][indices]
+    return entry
+
+
+def diff_prepared(prepared: dict, collection) -> dict:
+    """Reduce a prepared policy to the chunks that differ from the collection.
+
+    A chunk is kept when its ID is new or its stored metadata (content hash
+    included) differs; "indices" gives the kept chunks' positions in the
+    policy. IDs stored for the policy but no longer produced by the current
+    chunking are listed under "stale_ids", and the number of chunks left as
+    they are under "unchanged".
+    """
+    stored = collection.get(where={"policy_id": prepared["policy_id"]}, include=["metadatas"])
+    stored_meta = dict(zip(stored["ids"], stored["metadatas"]))
+    keep = [i for i, (chunk_id, meta) in enumerate(zip(prepared["ids"], prepared["metadatas"]))
+            if stored_meta.get(chunk_id) != meta]
+    current = set(prepared["ids"])
+    entry = select_chunks(prepared, keep)
+    entry["stale_ids"] = sorted(chunk_id for chunk_id in stored_meta if chunk_id not in current)
+    entry["unchanged"] = len(prepared["ids"]) - len(keep)
+    return entry
+
+
+def delete_stale(collection, prepared: list[dict]) -> int:
+    """Delete the "stale_ids" of diffed policies; returns how many were deleted.
+
+    Bumps the collection's corpus version when anything is deleted.
+    """
+    stale = [chunk_id for p in prepared for chunk_id in p.get("stale_ids", [])]
+    batch = max_batch_size(collection)
+    try:
+        for start in range(0, len(stale), batch):
+            collection.delete(ids=stale[start:start + batch])
+    finally:
+        if stale:
+            bump_corpus_version(collection)
+    return len(stale)
+
+
+def embed_prepared(prepared: list[dict], embedding_fn) -> float:
+    """Stage 1: embed the chunks of all prepared policies in a single call.
+
+    Each entry gets a float32 (n_chunks, dim) array under "embeddings".
+    Returns the seconds spent embedding.
+    """
+    documents = [doc for p in prepared for doc in p["documents"]]
+    t0 = time.perf_counter()
+    vectors = np.asarray(embedding_fn(documents), dtype=np.float32) if documents else None
+    elapsed = time.perf_counter() - t0
+
+    start = 0
+    for p in prepared:
+        n = len(p["documents"])
+        p["embeddings"] = vectors[start:start + n] if n else np.empty((0, 0), dtype=np.float32)
+        start += n
+    return elapsed
+
+
+def max_batch_size(collection) -> int:
+    """Largest add/upsert the collection's client accepts in one call."""
+    client = getattr(collection, "_client", None)
+    for attr in ("get_max_batch_size", "max_batch_size"):
+        value = getattr(client, attr, None)
+        try:
+            value = value() if callable(value) else value
+        except Exception:
+            continue
+        if isinstance(value, int) and value > 0:
+            return value
+    return CHROMA_DEFAULT_MAX_BATCH
+
+
+def write_prepared(collection, prepared: list[dict], upsert: bool = False) -> float:
+    """Stage 2: write chunks with their precomputed vectors in max_batch_size batches.
+
+    Chroma never calls the embedding function here. Every write bumps the
+    collection's corpus version (even one that fails halfway), so no writer
+    can leave a stale snapshot behind. Returns the seconds spent writing.
+    """
+    prepared = [p for p in prepared if p["ids"]]
+    if not prepared:
+        return 0.0
+    ids = [i for p in prepared for i in p["ids"]]
+    documents = [d for p in prepared for d in p["documents"]]
+    metadatas = [m for p in prepared for m in p["metadatas"]]
+    vectors = np.concatenate([p["embeddings"] for p in prepared])
+    write = collection.upsert if upsert else collection.add
+    batch = max_batch_size(collection)
+
+    t0 = time.perf_counter()
+    try:
+        for start in range(0, len(ids), batch):
+            end = start + batch
+            embeddings = vectors[start:end]
+            write(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=embeddings.tolist() if chroma_wants_lists() else embeddings,
+            )
+    finally:
+        bump_corpus_version(collection)
+    return time.perf_counter() - t0
+
+
+def _write_local(collection, prepared: list[dict], upsert: bool) -> dict:
+    """Write embedded policies and delete their stale chunks."""
+    return {
+        "chunks": sum(len(p["ids"]) for p in prepared),
+        "unchanged": sum(p.get("unchanged", 0) for p in prepared),
+        "write_seconds": write_prepared(collection, prepared, upsert=upsert),
+        "deleted": delete_stale(collection, prepared),
+    }
+
+
+def ingest_prepared(prepared: list[dict], collection, embedding_fn, upsert: bool = False,
+                    sync: "CloudSync | None" = None) -> dict:
+    """Embed, then bulk-write, prepared policies; returns per-stage timings.
+
+    With a CloudSync the same vectors are queued for the cloud before the
+    local write starts, so both targets are written concurrently.
+    """
+    embed_seconds = embed_prepared(prepared, embedding_fn)
+    if sync is not None:
+        for p in prepared:
+            sync.submit(p)
+    return {**_write_local(collection, prepared, upsert), "embed_seconds": embed_seconds}
+
+
+def ingest_incremental(prepared: list[dict], collection, embedding_fn,
+                       sync: "CloudSync | None" = None) -> dict:
+    """Embed and upsert only new or changed chunks, and delete stale ones.
+
+    With a CloudSync, each policy is also queued for the cloud, which its
+    workers diff separately, so a cloud collection that is new, was emptied
+    or missed an earlier push still receives every chunk it lacks; chunks
+    not embedded in this run are read back from the local collection
+    instead of being embedded again.
+
+    Chunk IDs are positional and chunk boundaries follow from the text
+    before them, so an edit re-embeds the chunks it touches plus every later
+    chunk whose text shifted; in the default char mode that is everything
+    from the edit to the end of the policy. Unedited policies cost one
+    metadata lookup, and with USE_EMBEDDING_CACHE a shifted chunk whose text
+    survived unchanged is served from the cache.
+    """
+    diffs = [diff_prepared(p, collection) for p in prepared]
+    embed_seconds = embed_prepared(diffs, embedding_fn)
+    if sync is not None:
+        for p, diff in zip(prepared, diffs):
+            sync.submit(p, embedded=diff, source=collection)
+    changed = [d for d in diffs if d["ids"] or d["stale_ids"]]
+    stats = {**_write_local(collection, changed, upsert=True), "embed_seconds": embed_seconds}
+    stats["unchanged"] = sum(d["unchanged"] for d in diffs)
+    return stats
+
+
+def format_throughput(stats: dict) -> str:
+    """One-line per-stage throughput of an ingest_prepared run."""
+    n = stats["chunks"]
+    parts = []
+    for stage in ("embed", "write"):
+        seconds = stats[f"{stage}_seconds"]
+        parts.append(f"{stage} {n / max(seconds, 1e-9):,.0f} chunks/s ({seconds:.1f}s)")
+    line = f"{n} chunks: " + ", ".join(parts)
+    if stats.get("unchanged") or stats.get("deleted"):
+        line += f"; {stats['unchanged']} unchanged, {stats['deleted']} stale deleted"
+    return line
+
+
+def ingest_policy(policy_id: str, collection, embedding_fn=None):
     """Ingest a single policy into ChromaDB."""
     metadata = load_metadata()
     policy = next((p for p in metadata["policies"] if p["policy_id"] == policy_id), None)
     if not policy:
         raise ValueError(f"Policy {policy_id} not found in metadata.json")
 
-    text = read_processed_file(policy_id)
-    chunks = chunk_text(text)
+    prepared = prepare_policy(policy_id, policy, read_processed_file(policy_id))
+    ingest_incremental([prepared], collection, embedding_fn or get_embedding_function())
+    return len(prepared["ids"])
 
-    ids = [f"{policy_id}_chunk_{i:04d}" for i in range(len(chunks))]
-    metadatas = [
-        {
-            "policy_id": policy_id,
-            "country": policy["country"],
-            "region": policy["region"],
-            "year": policy.get("year", 0),
-            "language": policy.get("language", ""),
-            "chunk_index": i,
-        }
-        for i in range(len(chunks))
-    ]
 
-    collection.add(documents=chunks, ids=ids, metadatas=metadatas)
-    return len(chunks)
+def legacy_collection_note(client, where: str) -> str | None:
+    """Migration note if client still has the fixed-name collection of earlier versions.
+
+    Before collections were namespaced by model and chunking (see
+    registry.collection_name), everything was stored in COLLECTION_NAME
+    itself. Nothing records which model or chunking produced those vectors,
+    so they are not copied: the next ingest fills the namespaced collection,
+    after which --drop-legacy removes the old one.
+    """
+    try:
+        legacy = client.get_collection(COLLECTION_NAME)
+    except Exception:
+        return None
+    return (f"{where} still has the pre-namespacing collection '{COLLECTION_NAME}' "
+            f"({legacy.count()} chunks), which is no longer read. Ingest fills "
+            f"'{collection_name()}'; then remove the old one with "
+            f"`python -m pipeline.ingest --drop-legacy`.")
+
 
+def drop_legacy_collections() -> list[str]:
+    """Delete the fixed-name COLLECTION_NAME collection locally and in the cloud.
 
-def get_or_create_collection():
-    """Get or create the local ChromaDB collection."""
-    import chromadb
+    Returns where one was deleted ("local", "cloud").
+    """
+    clients = [("local", get_chroma_client)]
+    if cloud_configured():
+        clients.append(("cloud", get_chroma_cloud_client))
+    dropped = []
+    for where, get_client in clients:
+        client = get_client()
+        if legacy_collection_note(client, where) is not None:
+            client.delete_collection(COLLECTION_NAME)
+            dropped.append(where)
+    return dropped
 
-    client = chromadb.PersistentClient(path=str(CHROMA_DIR))
-    embedding_fn = get_embedding_function()
+
+def get_or_create_collection(embed_workers: int = EMBED_WORKERS):
+    """Get or create the local collection of the active model and chunking."""
+    client = get_chroma_client()
+    embedding_fn = get_embedding_function(embed_workers)
     collection = client.get_or_create_collection(
-        name=COLLECTION_NAME,
+        name=collection_name(),
         embedding_function=embedding_fn,
+        metadata=collection_metadata(),
     )
+    if collection.count() == 0:
+        note = legacy_collection_note(client, "Local ChromaDB")
+        if note:
+            click.echo(f"  ⚠ {note}")
     return collection
 
 
-def get_or_create_cloud_collection():
+def get_or_create_cloud_collection(embed_workers: int = EMBED_WORKERS):
     """Get or create the Chroma Cloud collection for redundancy."""
-    if not CHROMA_CLOUD_API_KEY:
+    if not cloud_configured():
         return None
-    import chromadb
-
     try:
-        client = chromadb.CloudClient(
-            api_key=CHROMA_CLOUD_API_KEY,
-            tenant=CHROMA_CLOUD_TENANT,
-            database=CHROMA_CLOUD_DATABASE,
-        )
-        embedding_fn = get_embedding_function()
+        client = get_chroma_cloud_client()
+        embedding_fn = get_embedding_function(embed_workers)
         collection = client.get_or_create_collection(
-            name=COLLECTION_NAME,
+            name=collection_name(),
             embedding_function=embedding_fn,
+            metadata=collection_metadata(),
         )
+        if collection.count() == 0:
+            note = legacy_collection_note(client, "Chroma Cloud")
+            if note:
+                click.echo(f"  ⚠ {note}")
         return collection
     except Exception as e:
         click.echo(f"  ⚠ Chroma Cloud unavailable: {e}")
         return None
 
 
-def sync_to_cloud(policy_id: str, chunks: list[str], ids: list[str], metadatas: list[dict], cloud_collection):
-    """Sync ingested chunks to Chroma Cloud."""
-    if cloud_collection is None:
-        return
-    try:
-        cloud_collection.upsert(documents=chunks, ids=ids, metadatas=metadatas)
-    except Exception as e:
-        click.echo(f"  ⚠ Cloud sync failed for {policy_id}: {e}")
+class CloudSync:
+    """Background push of already-embedded policies to a second collection.
+
+    submit() queues a prepared policy and returns at once. `workers` threads
+    diff each queued policy against the target's stored IDs and content
+    hashes, as diff_prepared() does locally, so every run re-checks the cloud
+    instead of trusting earlier pushes. The chunks it lacks are upserted with
+    write_prepared, taking their vectors from `embedded` (chunks embedded in
+    this run) or reading them from `source`, so the target never re-embeds;
+    stale chunks are deleted and the IDs read back, and a policy only counts
+    as synced once the cloud holds it.
+
+    Failed diffs and pushes are retried with exponential backoff up to
+    `retries` times. A policy whose diff still fails marks the target
+    unavailable, and the rest of the queue is reported as failed without
+    further attempts. drain() waits for the queue and reports.
+    """
+
+    def __init__(self, collection, workers: int = CLOUD_SYNC_WORKERS,
+                 retries: int = CLOUD_SYNC_RETRIES, backoff: float = 1.0):
+        self.collection = collection
+        self.retries = retries
+        self.backoff = backoff
+        self.synced: list[str] = []
+        self.current: list[str] = []
+        self.failed: dict[str, str] = {}
+        self.chunks = 0
+        self.unavailable: str | None = None
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._t0 = time.perf_counter()
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _retry(self, policy_id: str, fn):
+        """fn() with backoff; None (and the policy marked failed) if every attempt raised."""
+        for attempt in range(self.retries + 1):
+            try:
+                return fn()
+            except Exception as e:
+                error = e
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        with self._lock:
+            self.failed[policy_id] = f"{type(error).__name__}: {error}"
+        return None
+
+    def submit(self, prepared: dict, embedded: dict | None = None, source=None):
+        """Queue a policy; embedded holds vectors for some or all of its chunks.
+
+        embedded defaults to prepared itself (which must then have been
+        embedded); chunks it lacks are read from the source collection.
+        """
+        self._queue.put((prepared, prepared if embedded is None else embedded, source))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._push(*item)
+
+    def _with_vectors(self, diff: dict, embedded: dict, source) -> dict:
+        """diff with an "embeddings" row per chunk, from embedded or else from source."""
+        row = {index: k for k, index in
+               enumerate(embedded.get("indices", range(len(embedded["ids"]))))}
+        missing = [chunk_id for index, chunk_id in zip(diff["indices"], diff["ids"])
+                   if index not in row]
+        stored = {}
+        if missing:
+            if source is None:
+                raise ValueError(f"no vectors for {len(missing)} chunks")
+            found = source.get(ids=missing, include=["embeddings"])
+            stored = dict(zip(found["ids"], np.asarray(found["embeddings"], dtype=np.float32)))
+            if len(stored) < len(missing):
+                raise ValueError(f"{len(missing) - len(stored)} chunks missing from the source")
+        vectors = [embedded["embeddings"][row[index]] if index in row else stored[chunk_id]
+                   for index, chunk_id in zip(diff["indices"], diff["ids"])]
+        return {**diff, "embeddings": np.array(vectors, dtype=np.float32)}
+
+    def _write(self, prepared: dict) -> bool:
+        write_prepared(self.collection, [prepared], upsert=True)
+        delete_stale(self.collection, [prepared])
+        ids = prepared["ids"] + prepared.get("stale_ids", [])
+        stored = self.collection.get(ids=ids, include=["metadatas"])
+        if dict(zip(stored["ids"], stored["metadatas"])) != dict(zip(prepared["ids"],
+                                                                     prepared["metadatas"])):
+            raise RuntimeError("chunks missing or different after the write")
+        return True
+
+    def _push(self, prepared: dict, embedded: dict, source):
+        policy_id = prepared["policy_id"]
+        if self.unavailable:
+            with self._lock:
+                self.failed[policy_id] = f"skipped, cloud unavailable ({self.unavailable})"
+            return
+        diff = self._retry(policy_id, lambda: diff_prepared(prepared, self.collection))
+        if diff is None:
+            self.unavailable = self.failed[policy_id]
+            return
+        if not diff["ids"] and not diff["stale_ids"]:
+            with self._lock:
+                self.current.append(policy_id)
+            return
+        if self._retry(policy_id, lambda: self._write(self._with_vectors(diff, embedded, source))):
+            with self._lock:
+                self.synced.append(policy_id)
+                self.chunks += len(diff["ids"])
+
+    def drain(self) -> dict:
+        """Wait for every queued push; returns synced/current/failed policies and timings."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        return {
+            "synced": sorted(self.synced),
+            "current": sorted(self.current),
+            "failed": dict(sorted(self.failed.items())),
+            "chunks": self.chunks,
+            "seconds": time.perf_counter() - self._t0,
+        }
+
+
+def format_sync_report(report: dict) -> list[str]:
+    """Summary lines of a CloudSync.drain() report."""
+    lines = [f"☁ Cloud: {len(report['synced'])} policies, {report['chunks']} chunks "
+             f"synced in {report['seconds']:.1f}s; {len(report['current'])} already up to date"]
+    for policy_id, error in report["failed"].items():
+        lines.append(f"⚠ Cloud sync failed for {policy_id}: {error}")
+    return lines
 
 
 @click.command()
 @click.option("--all", "ingest_all", is_flag=True, help="Ingest all policies")
 @click.option("--policy", help="Ingest a specific policy by ID")
 @click.option("--no-cloud", is_flag=True, help="Skip Chroma Cloud sync")
-def main(ingest_all: bool, policy: str, no_cloud: bool):
+@click.option("--embed-workers", default=EMBED_WORKERS, show_default=True,
+              help="Processes for local embedding, each with its own model copy")
+@click.option("--drop-legacy", is_flag=True,
+              help=f"Delete the old fixed-name '{COLLECTION_NAME}' collection (local + cloud)")
+def main(ingest_all: bool, policy: str, no_cloud: bool, embed_workers: int, drop_legacy: bool):
     """Ingest policy documents into ChromaDB (local + cloud)."""
-    collection = get_or_create_collection()
-    cloud_collection = None if no_cloud else get_or_create_cloud_collection()
+    if drop_legacy:
+        dropped = drop_legacy_collections()
+        click.echo(f"Dropped '{COLLECTION_NAME}' from: {', '.join(dropped) or 'nowhere (not found)'}")
+        if not (policy or ingest_all):
+            return
+
+    collection = get_or_create_collection(embed_workers)
+    cloud_collection = None if no_cloud else get_or_create_cloud_collection(embed_workers)
     metadata = load_metadata()
 
     if cloud_collection:
         click.echo("☁ Chroma Cloud connected — syncing enabled")
 
-    if policy:
-        n = ingest_policy(policy, collection)
-        click.echo(f"✓ {policy}: {n} chunks ingested (local)")
-        # Sync to cloud
-        text = read_processed_file(policy)
-        chunks = chunk_text(text)
-        p_meta = next((p for p in metadata["policies"] if p["policy_id"] == policy), {})
-        ids = [f"{policy}_chunk_{i:04d}" for i in range(len(chunks))]
-        metadatas = [{"policy_id": policy, "country": p_meta.get("country", ""), "region": p_meta.get("region", ""), "year": p_meta.get("year", 0), "language": p_meta.get("language", ""), "chunk_index": i} for i in range(len(chunks))]
-        sync_to_cloud(policy, chunks, ids, metadatas, cloud_collection)
-    elif ingest_all:
-        for p in tqdm(metadata["policies"], desc="Ingesting policies"):
+    if policy or ingest_all:
+        if policy:
+            p_meta = next((p for p in metadata["policies"] if p["policy_id"] == policy), None)
+            if p_meta is None:
+                raise click.ClickException(f"Policy {policy} not found in metadata.json")
+            selected = [p_meta]
+        else:
+            selected = metadata["policies"]
+
+        prepared = []
+        for p in tqdm(selected, desc="Chunking policies"):
             try:
                 text = read_processed_file(p["policy_id"])
-                chunks = chunk_text(text)
-                ids = [f"{p['policy_id']}_chunk_{i:04d}" for i in range(len(chunks))]
-                metadatas = [{"policy_id": p["policy_id"], "country": p["country"], "region": p["region"], "year": p.get("year", 0), "language": p.get("language", ""), "chunk_index": i} for i in range(len(chunks))]
-                collection.add(documents=chunks, ids=ids, metadatas=metadatas)
-                click.echo(f"  ✓ {p['policy_id']}: {len(chunks)} chunks (local)")
-                sync_to_cloud(p["policy_id"], chunks, ids, metadatas, cloud_collection)
             except FileNotFoundError:
                 click.echo(f"  ✗ {p['policy_id']}: no processed file found")
+                continue
+            prepared.append(prepare_policy(p["policy_id"], p, text))
+
+        sync = CloudSync(cloud_collection) if cloud_collection is not None else None
+        stats = ingest_incremental(prepared, collection, get_embedding_function(embed_workers),
+                                   sync=sync)
+        for p in prepared:
+            click.echo(f"  ✓ {p['policy_id']}: {len(p['ids'])} chunks (local)")
+        click.echo(f"  {format_throughput(stats)}")
+        if sync is not None:
+            for line in format_sync_report(sync.drain()):
+                click.echo(f"  {line}")
+        corpus = load_corpus(collection)
+        click.echo(f"  Snapshot: {len(corpus.chunk_ids)} chunks in {snapshot_dir(collection)}")
     else:
         click.echo("Use --all or --policy <id>")
+        return
+
+    for name, seconds in load_times().items():
+        click.echo(f"  Loaded {name} in {seconds:.2f}s")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+"""Async OpenAI embedding client with rate-limit-aware batching.
+
+Inputs are packed into requests under the API's per-request input and
+token limits, and up to OPENAI_MAX_CONCURRENCY requests are in flight at
+once. A 429 pauses every sender for the server's Retry-After (or an
+exponential backoff); 429, 5xx and connection errors retry only the batch
+that failed. Point OPENAI_BASE_URL at a stub server to test without the API.
+"""
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, EMBEDDING_MODEL_OPENAI,
+    OPENAI_MAX_INPUTS_PER_REQUEST, OPENAI_MAX_TOKENS_PER_REQUEST,
+    OPENAI_MAX_CONCURRENCY, OPENAI_MAX_RETRIES,
+)
+from .embedding_cache import PartialEmbeddingError
+
+_BACKOFF_BASE = 0.5  # seconds; doubled per attempt, with jitter
+_BACKOFF_MAX = 60.0
+
+
+def _token_counter(model_name: str):
+    """Exact token count with tiktoken when installed, else UTF-8 bytes (an upper bound)."""
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model_name)
+    except Exception:  # not installed, unknown model, or BPE file not downloadable
+        return lambda text: len(text.encode("utf-8"))
+    return lambda text: len(encoding.encode_ordinary(text))
+
+
+def pack_requests(token_counts: list[int], max_inputs: int = OPENAI_MAX_INPUTS_PER_REQUEST,
+                  max_tokens: int = OPENAI_MAX_TOKENS_PER_REQUEST) -> list[list[int]]:
+    """Group consecutive input indices into requests under both limits."""
+    batches, current, tokens = [], [], 0
+    for i, n in enumerate(token_counts):
+        if current and (len(current) == max_inputs or tokens + n > max_tokens):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(i)
+        tokens += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _retry_after(error) -> float | None:
+    """Server-requested wait in seconds from a rate-limit response, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    for header, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is not None:
+            try:
+                return float(value) / scale
+            except ValueError:
+                return None
+    return None
+
+
+class AsyncOpenAIEmbeddingFunction:
+    """OpenAI embeddings with bounded concurrency, 429 backoff and per-batch retries."""
+
+    def __init__(self, api_key: str = OPENAI_API_KEY, model_name: str = EMBEDDING_MODEL_OPENAI,
+                 base_url: str | None = OPENAI_BASE_URL or None,
+                 max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+                 max_retries: int = OPENAI_MAX_RETRIES,
+                 max_inputs: int = OPENAI_MAX_INPUTS_PER_REQUEST,
+                 max_tokens: int = OPENAI_MAX_TOKENS_PER_REQUEST):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.max_inputs = max_inputs
+        self.max_tokens = max_tokens
+        self.count_tokens = _token_counter(model_name)
+        self.requests = 0
+        self.retries = 0
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.embed(texts))
+        # Called from inside an event loop (e.g. Jupyter): run in a helper thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.embed(texts)).result()
+
+    async def embed(self, texts: list[str]) -> list[np.ndarray]:
+        """Embed texts; raises PartialEmbeddingError if some batch keeps failing."""
+        import openai
+
+        batches = pack_requests([self.count_tokens(t) for t in texts],
+                                self.max_inputs, self.max_tokens)
+        vectors: dict[int, np.ndarray] = {}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        resume_at = [0.0]  # shared pause after a 429
+
+        async with openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                      max_retries=0) as client:
+            async def send(batch: list[int]):
+                for attempt in range(self.max_retries + 1):
+                    if attempt:
+                        self.retries += 1
+                    async with semaphore:
+                        # Every sender honours the latest 429's pause
+                        delay = resume_at[0] - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                        try:
+                            response = await client.embeddings.create(
+                                input=[texts[i] for i in batch], model=self.model_name,
+                                encoding_format="float",
+                            )
+                        except openai.RateLimitError as e:
+                            pause = _retry_after(e) or _backoff(attempt)
+                            resume_at[0] = max(resume_at[0], time.monotonic() + pause)
+                            error, wait = e, 0.0
+                        except openai.APIStatusError as e:
+                            if e.status_code < 500:
+                                raise
+                            error, wait = e, _backoff(attempt)
+                        except openai.APIConnectionError as e:
+                            error, wait = e, _backoff(attempt)
+                        else:
+                            self.requests += 1
+                            for item in response.data:
+                                vectors[batch[item.index]] = np.asarray(item.embedding,
+                                                                        dtype=np.float32)
+                            return
+                    await asyncio.sleep(wait)
+                raise error
+
+            results = await asyncio.gather(*(send(b) for b in batches), return_exceptions=True)
+
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise PartialEmbeddingError(vectors, errors[0])
+        return [vectors[i] for i in range(len(texts))]
+
+
+def _backoff(attempt: int) -> float:
+    return min(_BACKOFF_MAX, _BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random() / 2)
@@ -1,12 +1,36 @@
 """Extract text from raw PDF policy documents."""
+import os
 import re
 import sys
+import json
+import time
+import hashlib
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+from concurrent.futures import ProcessPoolExecutor
 import click
 from pathlib import Path
 
+import pypdf
 from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
 
-from .config import RAW_DIR, PROCESSED_DIR, METADATA_FILE
+from .config import (
+    RAW_DIR, PROCESSED_DIR, METADATA_FILE, PREPROCESS_MANIFEST,
+    PREPROCESS_WORKERS, PREPROCESS_TIMEOUT, PAGE_WORKERS, PAGE_PARALLEL_MIN_PAGES,
+    PAGE_CACHE_DIR, PAGE_CACHE_MAX_MB, USE_PAGE_CACHE,
+)
+
+# Bump whenever clean_text (or extraction) changes its output, so the
+# manifest marks every processed document as stale
+CLEANER_VERSION = "1"
+
+# Documents shorter than this after cleaning are treated as failed extractions
+MIN_TEXT_CHARS = 500
 
 # Map raw directory names to config.py country keys
 DIR_TO_COUNTRY = {
@@ -35,30 +59,405 @@ DIR_TO_COUNTRY = {
 }
 
 
+def file_sha256(path: Path) -> str:
+    """SHA-256 hex digest of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest() -> dict:
+    """Load the processed-text manifest (policy_id -> source hash and cleaner version)."""
+    if PREPROCESS_MANIFEST.exists():
+        with open(PREPROCESS_MANIFEST, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"documents": {}}
+
+
+def save_manifest(manifest: dict):
+    """Write the manifest atomically next to the processed texts."""
+    tmp_path = PREPROCESS_MANIFEST.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp_path.replace(PREPROCESS_MANIFEST)
+
+
+def manifest_entry(pdf_path: Path, sha256: str, n_chars: int) -> dict:
+    """Manifest record for a freshly written processed text."""
+    try:
+        source = pdf_path.relative_to(RAW_DIR).as_posix()
+    except ValueError:
+        source = str(pdf_path)
+    return {
+        "source": source,
+        "sha256": sha256,
+        "cleaner_version": CLEANER_VERSION,
+        "chars": n_chars,
+    }
+
+
+def rebuild_reason(entry: dict | None, sha256: str, output_path: Path, force: bool) -> str | None:
+    """Why a document must be re-extracted, or None if its output is current."""
+    if force:
+        return "forced"
+    if not output_path.exists():
+        return "new"
+    if not output_path.with_suffix(".pages").exists():
+        return "no page index"
+    if entry is None:
+        return "not in manifest"
+    if entry.get("sha256") != sha256:
+        return "source PDF changed"
+    if entry.get("cleaner_version") != CLEANER_VERSION:
+        return f"cleaner v{entry.get('cleaner_version')} -> v{CLEANER_VERSION}"
+    return None
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# The clean_text rules, compiled once and applied in their original order:
+# removing one artifact can splice its neighbours into another (e.g.
+# "....12 | ...." -> "......."), so merging them into one combined scan
+# would not give the same output.
+_PAGE_NUMBER_RE = re.compile(r"\b\d{1,3}\s*\|\s*")      # isolated page numbers ("12 | ")
+_PAGE_FOOTER_RE = re.compile(r"Page \d+ of \d+", re.IGNORECASE)
+_DOT_LEADER_RE = re.compile(r"\.{4,}")                     # table-of-contents leaders
+# Null bytes and control characters (those not already collapsed as whitespace)
+_CONTROL_RE = re.compile(r"[\x00-\x08\x0e-\x1b]")
+
+
+def _clean_collapsed(text: str) -> str:
+    """Apply the artifact rules of clean_text to whitespace-collapsed text (no strip).
+
+    Each pass only runs when its cheapest necessary substring is present.
+    """
+    if "|" in text:
+        text = _PAGE_NUMBER_RE.sub("", text)
+    text = _PAGE_FOOTER_RE.sub("", text)
+    if "...." in text:
+        text = _DOT_LEADER_RE.sub(" ", text)
+    if _CONTROL_RE.search(text):
+        text = _CONTROL_RE.sub("", text)
+    return text
+
+
 def clean_text(text: str) -> str:
     """Clean extracted PDF text for embedding."""
     # Collapse multiple whitespace/newlines into single spaces
-    text = re.sub(r"\s+", " ", text)
-    # Remove isolated page numbers (common PDF artifact)
-    text = re.sub(r"\b\d{1,3}\s*\|\s*", "", text)
-    # Remove common header/footer patterns
-    text = re.sub(r"Page \d+ of \d+", "", text, flags=re.IGNORECASE)
-    # Remove excessive dots (table of contents leaders)
-    text = re.sub(r"\.{4,}", " ", text)
-    # Remove null bytes and control characters
-    text = re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", text)
-    return text.strip()
-
-
-def extract_pdf(pdf_path: Path) -> str:
-    """Extract text from a PDF file using pypdf."""
+    text = " ".join(text.split())
+    return _clean_collapsed(text).strip()
+
+
+def _safe_cut(text: str) -> int:
+    """Last position in collapsed text where it can be split for cleaning.
+
+    A cut at a space is safe when no clean_text rule can match across it:
+    the page-number rule only spans a space after a digit or "|", and the
+    "Page N of M" rule only after a digit, "e" or "f". Returns 0 if none.
+    """
+    p = text.rfind(" ")
+    while p > 0:
+        prev = text[p - 1]
+        if not prev.isdecimal() and prev not in "|eEfF":
+            return p
+        p = text.rfind(" ", 0, p)
+    return 0
+
+
+class StreamingCleaner:
+    """Incremental clean_text over a document fed one page at a time.
+
+    Concatenating the strings returned by feed() and close() gives exactly
+    clean_text("\\n\\n".join(pages)) for the non-empty pages, while only a
+    short tail after the last safe cut point is held in memory. page_offsets
+    collects, for every page fed (empty ones included), the character offset
+    in that output where the page starts.
+    """
+
+    def __init__(self):
+        self.page_offsets = []
+        self.n_chars = 0        # length of the output returned so far
+        self._pending = ""      # collapsed text after the last safe cut
+        self._started = False   # a non-empty page has been fed
+        self._emitted = False   # non-whitespace output has been returned
+        self._held = ""         # trailing whitespace, emitted only if text follows
+        self._waiting = 0       # fed pages whose start offset is not known yet
+
+    def feed(self, page_text: str) -> str:
+        """Add one page and return the cleaned text that is now final."""
+        self._waiting += 1
+        if not page_text:
+            return ""
+        self._record_offsets(self._page_start())
+        separator = "\n\n" if self._started else ""
+        self._started = True
+        buf = _WHITESPACE_RE.sub(" ", self._pending + separator + page_text)
+        cut = _safe_cut(buf)
+        self._pending = buf[cut:]
+        return self._emit(_clean_collapsed(buf[:cut]))
+
+    def close(self) -> str:
+        """Flush the remaining tail; trailing whitespace is dropped."""
+        out = self._emit(_clean_collapsed(self._pending))
+        self._pending = ""
+        self._held = ""
+        # Trailing empty pages start at the end of the text
+        self._record_offsets(self.n_chars)
+        self.page_offsets = [min(offset, self.n_chars) for offset in self.page_offsets]
+        return out
+
+    def _page_start(self) -> int:
+        """Output offset of the page about to be fed.
+
+        The held tail is cleaned on its own here; a rule that matches across
+        the page break can shift this by a few characters.
+        """
+        if not self._started:
+            return 0
+        before = self._held + _clean_collapsed(self._pending)
+        if not self._emitted:
+            before = before.lstrip()
+        before = before.rstrip()
+        if not before and not self._emitted:
+            return 0
+        # +1 for the space the page break collapses into
+        return self.n_chars + len(before) + 1
+
+    def _record_offsets(self, start: int):
+        if self.page_offsets:
+            start = max(start, self.page_offsets[-1])
+        self.page_offsets.extend([start] * self._waiting)
+        self._waiting = 0
+
+    def _emit(self, cleaned: str) -> str:
+        """Apply the leading/trailing strip of clean_text across pieces."""
+        text = self._held + cleaned
+        if not self._emitted:
+            text = text.lstrip()
+        body = text.rstrip()
+        self._held = text[len(body):]
+        if body:
+            self._emitted = True
+        self.n_chars += len(body)
+        return body
+
+
+def write_page_offsets(path: Path, offsets: list[int]):
+    """Write page start offsets as a little-endian uint32 array (one per PDF page)."""
+    data = array("I", offsets)
+    if sys.byteorder == "big":
+        data.byteswap()
+    tmp_path = path.with_suffix(".pages.tmp")
+    with open(tmp_path, "wb") as f:
+        data.tofile(f)
+    tmp_path.replace(path)
+
+
+@lru_cache(maxsize=None)
+def load_page_offsets(policy_id: str) -> array | None:
+    """Page start offsets for a processed text, or None if it has no sidecar."""
+    path = PROCESSED_DIR / f"{policy_id}.pages"
+    if not path.exists():
+        return None
+    data = array("I")
+    with open(path, "rb") as f:
+        data.frombytes(f.read())
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def page_for_offset(offsets, char_offset: int) -> int:
+    """1-based PDF page containing char_offset of the processed text."""
+    # Empty pages share the next page's offset; bisect_right skips past them
+    return max(1, bisect_right(offsets, char_offset))
+
+
+# Keys that do not affect extract_text output (or are too costly to hash)
+_FINGERPRINT_SKIP = {"/Parent", "/FontFile", "/FontFile2", "/FontFile3", "/Thumb", "/Metadata"}
+
+
+def _hash_pdf_object(digest, obj, seen: set):
+    """Feed a PDF object graph into digest, resolving indirect references once."""
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref in seen:
+            digest.update(b"R")
+            return
+        seen.add(ref)
+        obj = obj.get_object()
+
+    if isinstance(obj, DictionaryObject):
+        for key in sorted(obj):
+            if key in _FINGERPRINT_SKIP:
+                continue
+            digest.update(key.encode())
+            _hash_pdf_object(digest, obj[key], seen)
+        # Image pixels never contribute text; everything else (forms, ToUnicode maps) does
+        if isinstance(obj, StreamObject) and obj.get("/Subtype") != "/Image":
+            digest.update(obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            _hash_pdf_object(digest, item, seen)
+    else:
+        digest.update(repr(obj).encode())
+
+
+def page_fingerprint(page) -> str:
+    """Hash of the inputs pypdf's extract_text reads for one page.
+
+    Covers the content stream, the page resources (fonts with their
+    ToUnicode maps, form XObjects), the rotation and the pypdf version.
+    """
+    digest = hashlib.sha256(f"pypdf {pypdf.__version__}".encode())
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    digest.update(repr(page.get("/Rotate", 0)).encode())
+    if "/Resources" in page:
+        _hash_pdf_object(digest, page["/Resources"], set())
+    return digest.hexdigest()
+
+
+# A full page cache is pruned down to this share of its cap, so pruning
+# (a directory scan) runs once per many writes rather than on every one
+_PAGE_CACHE_PRUNE_TO = 0.8
+
+
+class PageTextCache:
+    """On-disk cache of extracted page text, keyed by page_fingerprint.
+
+    One small file per page under PAGE_CACHE_DIR; writes go through a temp
+    file so concurrent page workers can share the cache safely. File mtimes
+    record recency: once the cache outgrows max_bytes, the least recently
+    used pages are deleted until it is back under _PAGE_CACHE_PRUNE_TO of it.
+    """
+
+    def __init__(self, root: Path = PAGE_CACHE_DIR, max_bytes: int = PAGE_CACHE_MAX_MB * 2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # bytes on disk, measured on the first write
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.txt"
+
+    def _files(self) -> list[tuple[float, int, Path]]:
+        files = []
+        for path in self.root.glob("*/*.txt"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # pruned by another worker
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def prune(self):
+        """Delete least recently used pages until the cache fits its cap."""
+        files = sorted(self._files())
+        self._size = sum(size for _, size, _ in files)
+        target = int(self.max_bytes * _PAGE_CACHE_PRUNE_TO)
+        for _, size, path in files:
+            if self._size <= target:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+
+    def extract(self, page) -> str:
+        """Return the page text, calling extract_text only on a cache miss."""
+        key = page_fingerprint(page)
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            pass
+        else:
+            self.hits += 1
+            os.utime(path)
+            return text
+
+        self.misses += 1
+        text = page.extract_text() or ""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        tmp_path.replace(path)
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._files())
+        else:
+            self._size += path.stat().st_size
+        if self._size > self.max_bytes:
+            self.prune()
+        return text
+
+
+def _extract_page(page, cache: PageTextCache | None) -> str:
+    """Extract one page's text, through the cache when one is given."""
+    if cache is None:
+        return page.extract_text() or ""
+    return cache.extract(page)
+
+
+def extract_page_range(pdf_path: Path, start: int = 0, stop: int | None = None,
+                       page_cache: bool = False) -> list[str]:
+    """Extract the text of pages [start, stop) of a PDF, one entry per page."""
     reader = PdfReader(pdf_path)
-    pages = []
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            pages.append(page_text)
-    return "\n\n".join(pages)
+    cache = PageTextCache() if page_cache else None
+    return [_extract_page(page, cache) for page in reader.pages[start:stop]]
+
+
+def _page_ranges(n_pages: int, n_ranges: int) -> list[tuple[int, int]]:
+    """Split n_pages into at most n_ranges contiguous, near-equal ranges."""
+    n_ranges = max(1, min(n_ranges, n_pages))
+    step, extra = divmod(n_pages, n_ranges)
+    ranges, start = [], 0
+    for i in range(n_ranges):
+        stop = start + step + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def iter_page_texts(pdf_path: Path, page_workers: int = PAGE_WORKERS,
+                    page_cache: bool = USE_PAGE_CACHE):
+    """Yield the text of each page of a PDF in order ("" for pages without text).
+
+    With page_workers > 1, documents of at least PAGE_PARALLEL_MIN_PAGES pages
+    are split into page ranges that are extracted on separate processes and
+    yielded back in page order. With page_cache, pages whose content was
+    already seen (e.g. in a previous release of the same PDF) are read from
+    PageTextCache instead of being re-extracted.
+    """
+    reader = PdfReader(pdf_path)
+    n_pages = len(reader.pages)
+
+    if page_workers > 1 and n_pages >= PAGE_PARALLEL_MIN_PAGES:
+        # Several ranges per worker so a few slow pages don't leave workers idle
+        ranges = _page_ranges(n_pages, page_workers * 4)
+        with ProcessPoolExecutor(max_workers=page_workers) as executor:
+            parts = executor.map(
+                extract_page_range,
+                [pdf_path] * len(ranges),
+                [start for start, _ in ranges],
+                [stop for _, stop in ranges],
+                [page_cache] * len(ranges),
+            )
+            for part in parts:
+                yield from part
+    else:
+        cache = PageTextCache() if page_cache else None
+        for page in reader.pages:
+            yield _extract_page(page, cache)
+
+
+def extract_pdf(pdf_path: Path, page_workers: int = PAGE_WORKERS,
+                page_cache: bool = USE_PAGE_CACHE) -> str:
+    """Extract text from a PDF file using pypdf (see iter_page_texts)."""
+    pages = iter_page_texts(pdf_path, page_workers=page_workers, page_cache=page_cache)
+    return "\n\n".join(text for text in pages if text)
 
 
 def build_policy_id(country_key: str, filename: str) -> str:
@@ -70,46 +469,186 @@ def build_policy_id(country_key: str, filename: str) -> str:
     return f"{country_key}_{stem}"
 
 
-def preprocess_all(force: bool = False):
-    """Extract text from all available PDFs in policies/raw/."""
+def process_pdf(pdf_path: Path, output_path: Path, page_workers: int = PAGE_WORKERS,
+                page_cache: bool = USE_PAGE_CACHE) -> int:
+    """Extract and clean one PDF, writing it to output_path.
+
+    Returns the cleaned length; nothing is written when it is below
+    MIN_TEXT_CHARS. Pages go through StreamingCleaner, which also yields the
+    page-offset sidecar ({policy_id}.pages), and each cleaned piece is
+    written as soon as it is final, so memory stays flat in document size.
+    """
+    # Write via a temp file so a killed worker never leaves a partial .txt
+    tmp_path = output_path.with_suffix(".txt.tmp")
+    cleaner = StreamingCleaner()
+    pages = iter_page_texts(pdf_path, page_workers, page_cache)
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for page_text in pages:
+            f.write(cleaner.feed(page_text))
+        f.write(cleaner.close())
+
+    if cleaner.n_chars < MIN_TEXT_CHARS:
+        tmp_path.unlink()
+        return cleaner.n_chars
+    write_page_offsets(output_path.with_suffix(".pages"), cleaner.page_offsets)
+    tmp_path.replace(output_path)
+    return cleaner.n_chars
+
+
+def _process_pdf_worker(pdf_path: Path, output_path: Path, page_workers: int,
+                        page_cache: bool, conn):
+    """Process-pool entry point: run process_pdf and report over a pipe."""
+    try:
+        conn.send(("ok", process_pdf(pdf_path, output_path, page_workers, page_cache)))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+def _run_workers(jobs: list[tuple], workers: int, timeout: float,
+                 page_workers: int = 1, page_cache: bool = USE_PAGE_CACHE):
+    """Run (policy_id, pdf_path, output_path) jobs on up to `workers` processes.
+
+    Yields (policy_id, status, value) in completion order, where status is
+    "ok" (value = cleaned length), "error" or "timeout" (value = message).
+    Each document gets its own process so one that exceeds `timeout` seconds
+    can be terminated without stalling the rest of the run.
+    """
+    ctx = multiprocessing.get_context()
+    queue = deque(jobs)
+    running = {}  # conn -> (policy_id, process, deadline, output_path)
+
+    while queue or running:
+        while queue and len(running) < workers:
+            policy_id, pdf_path, output_path = queue.popleft()
+            recv_conn, send_conn = ctx.Pipe(duplex=False)
+            # Not daemonic: page-parallel extraction starts its own children
+            proc = ctx.Process(
+                target=_process_pdf_worker,
+                args=(pdf_path, output_path, page_workers, page_cache, send_conn),
+            )
+            proc.start()
+            send_conn.close()
+            deadline = time.monotonic() + timeout if timeout else None
+            running[recv_conn] = (policy_id, proc, deadline, output_path)
+
+        deadlines = [d for _, _, d, _ in running.values() if d is not None]
+        wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+
+        for conn in wait(list(running), timeout=wait_for):
+            policy_id, proc, _, _ = running.pop(conn)
+            try:
+                status, value = conn.recv()
+            except EOFError:
+                proc.join()
+                status, value = "error", f"worker exited with code {proc.exitcode}"
+            conn.close()
+            proc.join()
+            yield policy_id, status, value
+
+        now = time.monotonic()
+        for conn, (policy_id, proc, deadline, output_path) in list(running.items()):
+            if deadline is not None and now >= deadline:
+                proc.terminate()
+                proc.join()
+                conn.close()
+                output_path.with_suffix(".txt.tmp").unlink(missing_ok=True)
+                del running[conn]
+                yield policy_id, "timeout", f"Timed out after {timeout:g}s"
+
+
+def preprocess_all(force: bool = False, workers: int = PREPROCESS_WORKERS,
+                   timeout: float = PREPROCESS_TIMEOUT, page_workers: int = PAGE_WORKERS,
+                   page_cache: bool = USE_PAGE_CACHE):
+    """Extract text from all available PDFs in policies/raw/.
+
+    Only documents whose PDF hash or CLEANER_VERSION differs from the
+    manifest (or that have no output yet) are re-extracted; the reason is
+    reported in results["reasons"]. With workers > 1 documents are extracted
+    on a process pool, each with a per-document timeout. The result lists
+    keep the sorted input order either way.
+    """
     PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-    results = {"processed": [], "skipped": [], "failed": []}
+    results = {"processed": [], "skipped": [], "failed": [], "reasons": {}}
+    manifest = load_manifest()
+    documents = manifest.setdefault("documents", {})
 
+    jobs = []
     for pdf_path in sorted(RAW_DIR.rglob("*.pdf")):
         dir_name = pdf_path.parent.name
         country_key = DIR_TO_COUNTRY.get(dir_name, dir_name)
         policy_id = build_policy_id(country_key, pdf_path.name)
-        output_path = PROCESSED_DIR / f"{policy_id}.txt"
+        jobs.append((policy_id, pdf_path, PROCESSED_DIR / f"{policy_id}.txt"))
 
-        if output_path.exists() and not force:
-            click.echo(f"  SKIP  {policy_id} (already processed)")
-            results["skipped"].append(policy_id)
-            continue
+    outcomes = {}  # policy_id -> (status, value)
+    hashes = {}
+    todo = []
+    for policy_id, pdf_path, output_path in jobs:
+        hashes[policy_id] = file_sha256(pdf_path)
+        reason = rebuild_reason(documents.get(policy_id), hashes[policy_id], output_path, force)
+        if reason is None:
+            click.echo(f"  SKIP  {policy_id} (up to date)")
+            outcomes[policy_id] = ("skipped", None)
+        else:
+            results["reasons"][policy_id] = reason
+            todo.append((policy_id, pdf_path, output_path))
 
-        click.echo(f"  GET   {policy_id}...", nl=False)
-        try:
-            raw_text = extract_pdf(pdf_path)
-            cleaned = clean_text(raw_text)
-
-            if len(cleaned) < 500:
-                click.echo(f" FAIL (too short: {len(cleaned)} chars)")
-                results["failed"].append((policy_id, "Extracted text too short"))
-                continue
+    if workers > 1 and len(todo) > 1:
+        click.echo(f"  Extracting {len(todo)} documents on {workers} workers...")
+        for policy_id, status, value in _run_workers(todo, workers, timeout, page_workers, page_cache):
+            outcomes[policy_id] = (status, value)
+            if status == "ok" and value >= MIN_TEXT_CHARS:
+                click.echo(f"  OK    {policy_id} ({value:,} chars)")
+            elif status == "ok":
+                click.echo(f"  FAIL  {policy_id} (too short: {value} chars)")
+            else:
+                click.echo(f"  FAIL  {policy_id} ({value})")
+    else:
+        for policy_id, pdf_path, output_path in todo:
+            click.echo(f"  GET   {policy_id} ({results['reasons'][policy_id]})...", nl=False)
+            try:
+                n_chars = process_pdf(pdf_path, output_path, page_workers, page_cache)
+                outcomes[policy_id] = ("ok", n_chars)
+                if n_chars >= MIN_TEXT_CHARS:
+                    click.echo(f" OK ({n_chars:,} chars)")
+                else:
+                    click.echo(f" FAIL (too short: {n_chars} chars)")
+            except Exception as e:
+                click.echo(f" FAIL ({e})")
+                outcomes[policy_id] = ("error", str(e))
 
-            output_path.write_text(cleaned, encoding="utf-8")
-            click.echo(f" OK ({len(cleaned):,} chars)")
+    # Assemble the summary in input order, independent of completion order
+    for policy_id, pdf_path, _ in jobs:
+        status, value = outcomes[policy_id]
+        if status == "skipped":
+            results["skipped"].append(policy_id)
+        elif status == "ok" and value >= MIN_TEXT_CHARS:
             results["processed"].append(policy_id)
-        except Exception as e:
-            click.echo(f" FAIL ({e})")
-            results["failed"].append((policy_id, str(e)))
+            documents[policy_id] = manifest_entry(pdf_path, hashes[policy_id], value)
+        elif status == "ok":
+            results["failed"].append((policy_id, "Extracted text too short"))
+        else:
+            results["failed"].append((policy_id, value))
 
+    if results["processed"]:
+        save_manifest(manifest)
     return results
 
 
 @click.command()
-@click.option("--force", is_flag=True, help="Reprocess even if output exists")
+@click.option("--force", is_flag=True, help="Reprocess even if output is up to date")
 @click.option("--policy", help="Process a single policy by its raw dir/filename")
-def main(force: bool, policy: str):
+@click.option("--workers", default=PREPROCESS_WORKERS, show_default=True,
+              help="Extract documents in parallel on N processes")
+@click.option("--timeout", type=float, default=PREPROCESS_TIMEOUT, show_default=True,
+              help="Per-document timeout in seconds (with --workers > 1)")
+@click.option("--page-workers", default=PAGE_WORKERS, show_default=True,
+              help="Extract the pages of large PDFs on N processes")
+@click.option("--no-page-cache", is_flag=True, help="Re-extract every page, ignoring the page cache")
+def main(force: bool, policy: str, workers: int, timeout: float, page_workers: int,
+         no_page_cache: bool):
     """Extract text from raw PDF policy documents."""
     click.echo("=" * 50)
     click.echo("PDF TEXT EXTRACTION")
@@ -126,13 +665,21 @@ def main(force: bool, policy: str):
         policy_id = build_policy_id(country_key, pdf_path.name)
         PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
-        raw_text = extract_pdf(pdf_path)
-        cleaned = clean_text(raw_text)
         output_path = PROCESSED_DIR / f"{policy_id}.txt"
-        output_path.write_text(cleaned, encoding="utf-8")
-        click.echo(f"  OK {policy_id}: {len(cleaned):,} chars -> {output_path}")
+        n_chars = process_pdf(pdf_path, output_path, page_workers,
+                              page_cache=not no_page_cache)
+        if n_chars < MIN_TEXT_CHARS:
+            click.echo(f"  FAIL {policy_id}: too short ({n_chars} chars)")
+            sys.exit(1)
+        manifest = load_manifest()
+        manifest.setdefault("documents", {})[policy_id] = manifest_entry(
+            pdf_path, file_sha256(pdf_path), n_chars
+        )
+        save_manifest(manifest)
+        click.echo(f"  OK {policy_id}: {n_chars:,} chars -> {output_path}")
     else:
-        results = preprocess_all(force=force)
+        results = preprocess_all(force=force, workers=workers, timeout=timeout,
+                                 page_workers=page_workers, page_cache=not no_page_cache)
         click.echo()
         click.echo("=" * 50)
         click.echo("SUMMARY")
@@ -140,6 +687,11 @@ def main(force: bool, policy: str):
         click.echo(f"  Processed: {len(results['processed'])}")
         click.echo(f"  Skipped:   {len(results['skipped'])}")
         click.echo(f"  Failed:    {len(results['failed'])}")
+        if results["processed"]:
+            click.echo()
+            click.echo("REBUILT:")
+            for pid in results["processed"]:
+                click.echo(f"  {pid}: {results['reasons'][pid]}")
         if results["failed"]:
             click.echo()
             click.echo("FAILURES:")
@@ -0,0 +1,111 @@
+"""Process-wide registry of loaded embedding models and open ChromaDB clients.
+
+Everything is built lazily on first use, once per process, and shared
+between threads; load_times() reports how long each load took.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from .config import (
+    CHROMA_DIR, CHROMA_CLOUD_API_KEY, CHROMA_CLOUD_TENANT, CHROMA_CLOUD_DATABASE,
+    CHROMA_CLOUD_URL, COLLECTION_NAME,
+)
+
+_items: dict[tuple, object] = {}
+_load_times: dict[tuple, float] = {}
+_key_locks: dict[tuple, threading.Lock] = {}
+_lock = threading.Lock()
+
+
+def get_or_load(key: tuple, factory):
+    """Return the object registered under key, building it with factory() once.
+
+    Concurrent callers of the same key wait for a single load; a factory that
+    raises leaves nothing registered, so the next call tries again.
+    """
+    try:
+        return _items[key]
+    except KeyError:
+        pass
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        if key not in _items:
+            t0 = time.perf_counter()
+            item = factory()
+            _load_times[key] = time.perf_counter() - t0
+            _items[key] = item
+    return _items[key]
+
+
+def load_times() -> dict[str, float]:
+    """Seconds spent loading each registered object, by readable key."""
+    return {":".join(str(part) for part in key): seconds
+            for key, seconds in _load_times.items()}
+
+
+def collection_metadata(model_name: str | None = None) -> dict:
+    """Embedding model and chunking settings a collection's vectors come from.
+
+    Defaults to the active model (embeddings.embedding_model_name()) and
+    the current chunking.chunking_config().
+    """
+    from .chunking import chunking_config
+    from .embeddings import embedding_model_name
+    return {"embedding_model": model_name or embedding_model_name(), **chunking_config()}
+
+
+def collection_name(model_name: str | None = None) -> str:
+    """Chroma collection holding the vectors of model_name under the current chunking.
+
+    Each (model, chunk size, overlap, chunker version) gets its own
+    collection, so switching or comparing models reuses stored vectors
+    instead of re-embedding into a single shared collection.
+    """
+    metadata = collection_metadata(model_name)
+    digest = hashlib.blake2b(json.dumps(metadata, sort_keys=True).encode("utf-8"),
+                             digest_size=4).hexdigest()
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", metadata["embedding_model"]).strip("-")[:20].strip("-")
+    return f"{COLLECTION_NAME}-{slug}-{digest}"
+
+
+def get_chroma_client():
+    """Shared PersistentClient of the local ChromaDB."""
+    def open_client():
+        import chromadb
+        return chromadb.PersistentClient(path=str(CHROMA_DIR))
+
+    return get_or_load(("chroma", "local", str(CHROMA_DIR)), open_client)
+
+
+def cloud_configured() -> bool:
+    """Whether a Chroma Cloud (or stand-in HTTP server) is configured."""
+    return bool(CHROMA_CLOUD_API_KEY or CHROMA_CLOUD_URL)
+
+
+def get_chroma_cloud_client():
+    """Shared Chroma Cloud client (raises if the cloud is unreachable).
+
+    With CHROMA_CLOUD_URL set, an HttpClient for that server (e.g. a local
+    `chroma run`) stands in for the cloud.
+    """
+    def open_client():
+        import chromadb
+        if CHROMA_CLOUD_URL:
+            url = urlparse(CHROMA_CLOUD_URL)
+            return chromadb.HttpClient(
+                host=url.hostname, port=url.port or (443 if url.scheme == "https" else 8000),
+                ssl=url.scheme == "https",
+            )
+        return chromadb.CloudClient(
+            api_key=CHROMA_CLOUD_API_KEY,
+            tenant=CHROMA_CLOUD_TENANT,
+            database=CHROMA_CLOUD_DATABASE,
+        )
+
+    return get_or_load(("chroma", "cloud", CHROMA_CLOUD_URL or CHROMA_CLOUD_TENANT,
+                        CHROMA_CLOUD_DATABASE), open_client)
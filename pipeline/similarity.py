@@ -1,27 +1,30 @@
 """Similarity analysis between policy documents."""
 import json
+from pathlib import Path
+
 import numpy as np
-from scipy.spatial.distance import cosine
-from collections import defaultdict
 
-from .config import (
-    DIMENSIONS, COUNTRIES, COLLECTION_NAME, CHROMA_DIR,
-    CHROMA_CLOUD_API_KEY, CHROMA_CLOUD_TENANT, CHROMA_CLOUD_DATABASE,
-)
-from .embeddings import get_embedding_function
+from .config import DIMENSIONS, SIM_BLOCK_SIZE, SIM_MAX_IN_MEMORY_MB, SIMILARITY_MATRIX_FILE
+from .corpus import CorpusEmbeddings, fetch_corpus, load_corpus
+from .embeddings import embedding_model_name, get_embedding_function
+from .registry import cloud_configured, collection_name, get_chroma_client, get_chroma_cloud_client
 
 
-def get_collection():
-    """Get the ChromaDB collection (local primary, cloud fallback)."""
-    import chromadb
+def get_collection(name: str | None = None):
+    """Get a ChromaDB collection (local primary, cloud fallback).
 
+    name defaults to the collection of the active model and chunking (see
+    registry.collection_name); pass collection_name(model) to read vectors
+    stored for another model. Queries always embed with the active model.
+    """
+    name = name or collection_name()
     embedding_fn = get_embedding_function()
 
     # Try local first
     try:
-        client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+        client = get_chroma_client()
         collection = client.get_collection(
-            name=COLLECTION_NAME,
+            name=name,
             embedding_function=embedding_fn,
         )
         if collection.count() > 0:
@@ -30,24 +33,20 @@ def get_collection():
         pass
 
     # Fall back to cloud if local is empty/missing
-    if CHROMA_CLOUD_API_KEY:
+    if cloud_configured():
         try:
-            client = chromadb.CloudClient(
-                api_key=CHROMA_CLOUD_API_KEY,
-                tenant=CHROMA_CLOUD_TENANT,
-                database=CHROMA_CLOUD_DATABASE,
-            )
+            client = get_chroma_cloud_client()
             return client.get_collection(
-                name=COLLECTION_NAME,
+                name=name,
                 embedding_function=embedding_fn,
             )
         except Exception:
             pass
 
     # Last resort: return local even if empty
-    client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+    client = get_chroma_client()
     return client.get_collection(
-        name=COLLECTION_NAME,
+        name=name,
         embedding_function=embedding_fn,
     )
 
@@ -63,51 +62,117 @@ def get_policy_embedding(collection, policy_id: str) -> np.ndarray:
     return np.mean(results["embeddings"], axis=0)
 
 
-def compute_similarity_matrix(collection, policy_ids: list[str]) -> np.ndarray:
-    """Compute pairwise cosine similarity matrix."""
-    embeddings = {}
-    for pid in policy_ids:
-        try:
-            embeddings[pid] = get_policy_embedding(collection, pid)
-        except ValueError:
-            continue
-
-    n = len(embeddings)
-    ids = list(embeddings.keys())
-    matrix = np.zeros((n, n))
-
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                matrix[i][j] = 1.0
-            elif j > i:
-                sim = 1 - cosine(embeddings[ids[i]], embeddings[ids[j]])
-                matrix[i][j] = sim
-                matrix[j][i] = sim
-
-    return matrix, ids
-
-
-def compute_dimension_scores(collection, policy_ids: list[str]) -> dict:
-    """Score each policy on each analytical dimension using query similarity."""
-    embedding_fn = get_embedding_function()
-    scores = {}
-
-    for dim_key, dim_info in DIMENSIONS.items():
-        # Get embedding for the dimension query
-        dim_embedding = embedding_fn([dim_info["query"]])[0]
-
-        for pid in policy_ids:
-            try:
-                policy_emb = get_policy_embedding(collection, pid)
-                sim = 1 - cosine(policy_emb, dim_embedding)
-                if pid not in scores:
-                    scores[pid] = {}
-                scores[pid][dim_key] = float(sim)
-            except ValueError:
-                continue
-
-    return scores
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """float32 copy of matrix with unit-length rows (all-zero rows stay zero)."""
+    matrix = np.array(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
+    return matrix
+
+
+def cosine_similarity_matrix(vectors: np.ndarray, block: int = SIM_BLOCK_SIZE,
+                             out: np.ndarray | None = None) -> np.ndarray:
+    """Pairwise cosine similarities of the rows of vectors.
+
+    Rows are normalized once; the matrix is filled block by block with
+    float32 matrix products, computing only the upper triangle of blocks
+    and mirroring it, so the result is exactly symmetric with a unit
+    diagonal. out may be any (n, n) array, e.g. a memmap from
+    similarity_memmap, so the matrix never has to fit in RAM at once.
+    """
+    unit = normalize_rows(vectors)
+    n = len(unit)
+    if out is None:
+        out = np.empty((n, n), dtype=np.float32)
+    for i in range(0, n, block):
+        rows = unit[i:i + block]
+        for j in range(i, n, block):
+            product = rows @ unit[j:j + block].T
+            if j == i:
+                # Mirror the upper half of diagonal blocks, with exact 1.0s
+                product = np.triu(product, 1)
+                product += product.T
+                np.fill_diagonal(product, 1.0)
+            out[i:i + block, j:j + block] = product
+            if j != i:
+                out[j:j + block, i:i + block] = product.T
+    return out
+
+
+def similarity_memmap(n: int, path: Path = SIMILARITY_MATRIX_FILE) -> np.ndarray:
+    """Writable (n, n) float32 .npy memmap for an out-of-core similarity matrix."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, n))
+
+
+def compute_similarity_matrix(collection, policy_ids: list[str],
+                              corpus: CorpusEmbeddings | None = None,
+                              max_in_memory_mb: int = SIM_MAX_IN_MEMORY_MB) -> np.ndarray:
+    """Compute pairwise cosine similarity matrix.
+
+    Centroids come from corpus, fetched from the collection in one pass
+    when not given. Matrices larger than max_in_memory_mb are written to
+    SIMILARITY_MATRIX_FILE and returned as a float32 memmap; smaller ones
+    are returned in memory as float64.
+    """
+    corpus = corpus if corpus is not None else fetch_corpus(collection)
+    centroids, ids = corpus.centroids(policy_ids)
+
+    n = len(ids)
+    if n * n * 4 > max_in_memory_mb * 2**20:
+        matrix = cosine_similarity_matrix(centroids, out=similarity_memmap(n))
+        matrix.flush()
+        return matrix, ids
+    return cosine_similarity_matrix(centroids).astype(np.float64), ids
+
+
+# Query vectors by (embedding model, query text), so an added dimension costs one embedding
+_query_vectors: dict[tuple, np.ndarray] = {}
+
+
+def _model_key(embedding_fn):
+    """What the query vectors of embedding_fn are cached under.
+
+    The active model's name for the default function; otherwise the
+    function's own model_name, or the function itself if it has none.
+    """
+    if embedding_fn is None:
+        return embedding_model_name()
+    return getattr(embedding_fn, "model_name", None) or embedding_fn
+
+
+def dimension_matrix(dimensions: dict = DIMENSIONS, embedding_fn=None) -> tuple[np.ndarray, list[str]]:
+    """Unit-length query vectors of the dimensions, one row each, and their keys.
+
+    Queries not embedded before in this process by the same model are
+    embedded in a single batch; the others are reused.
+    """
+    model = _model_key(embedding_fn)
+    keys = list(dimensions)
+    missing = [key for key in keys if (model, dimensions[key]["query"]) not in _query_vectors]
+    if missing:
+        embedding_fn = embedding_fn or get_embedding_function()
+        vectors = normalize_rows(embedding_fn([dimensions[key]["query"] for key in missing]))
+        for key, vector in zip(missing, vectors):
+            _query_vectors[(model, dimensions[key]["query"])] = vector
+    return np.stack([_query_vectors[(model, dimensions[key]["query"])] for key in keys]), keys
+
+
+def compute_dimension_scores(collection, policy_ids: list[str],
+                             corpus: CorpusEmbeddings | None = None) -> dict:
+    """Score each policy on each analytical dimension using query similarity.
+
+    Scores are the cosine similarities of policy centroids and dimension
+    queries, computed as one (policies x dimensions) matrix product.
+    """
+    corpus = corpus if corpus is not None else fetch_corpus(collection)
+    centroids, ids = corpus.centroids(policy_ids)
+    if not ids:
+        return {}
+    queries, dim_keys = dimension_matrix()
+    scores = normalize_rows(centroids) @ queries.T
+    return {pid: dict(zip(dim_keys, row)) for pid, row in zip(ids, scores.tolist())}
 
 
 if __name__ == "__main__":
@@ -120,8 +185,9 @@ if __name__ == "__main__":
         metadata = json.load(f)
     policy_ids = [p["policy_id"] for p in metadata["policies"]]
 
-    matrix, ids = compute_similarity_matrix(collection, policy_ids)
+    corpus = load_corpus(collection)
+    matrix, ids = compute_similarity_matrix(collection, policy_ids, corpus)
     print(f"Similarity matrix computed: {matrix.shape}")
 
-    scores = compute_dimension_scores(collection, policy_ids)
+    scores = compute_dimension_scores(collection, policy_ids, corpus)
     print(f"Dimension scores computed for {len(scores)} policies")
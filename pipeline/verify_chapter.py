@@ -10,8 +10,9 @@ import sys
 import textwrap
 from pathlib import Path
 
-from pipeline.config import PROJECT_ROOT
+from pipeline.config import PROJECT_ROOT, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_MODE
 from pipeline.ingest import get_or_create_collection
+from pipeline.preprocess import load_page_offsets, page_for_offset
 
 
 TEX_DIR = PROJECT_ROOT / "document" / "chapters"
@@ -101,6 +102,26 @@ def extract_claims(tex_path: Path) -> list[dict]:
     return claims
 
 
+def resolve_page(meta: dict) -> int | None:
+    """PDF page of a matched chunk: from its metadata, else from the page index.
+
+    The chunk's stored char_start locates it in the page index; chunks
+    stored before char_start existed fall back to their position, which
+    only gives a char offset for fixed char windows.
+    """
+    if "page" in meta:
+        return meta["page"]
+    offsets = load_page_offsets(meta.get("policy_id", ""))
+    if offsets is None:
+        return None
+    if "char_start" in meta:
+        return page_for_offset(offsets, meta["char_start"])
+    chunk_index = meta.get("chunk_index", -1)
+    if CHUNK_MODE != "chars" or chunk_index < 0:
+        return None
+    return page_for_offset(offsets, chunk_index * (CHUNK_SIZE - CHUNK_OVERLAP))
+
+
 def verify_claims(claims: list[dict], collection, threshold: float, n_results: int):
     """Query ChromaDB for each claim and assess support level."""
     results = []
@@ -140,6 +161,7 @@ def verify_claims(claims: list[dict], collection, threshold: float, n_results: i
                 "policy_id": meta.get("policy_id", "unknown"),
                 "country": meta.get("country", "unknown"),
                 "chunk_index": meta.get("chunk_index", -1),
+                "page": resolve_page(meta),
                 "similarity": round(similarity, 3),
                 "snippet": (doc[:120] + "...") if doc and len(doc) > 120 else (doc or ""),
             })
@@ -194,7 +216,8 @@ def print_report(results: list[dict], chapter: str, threshold: float):
 
         if r.get("matches"):
             top = r["matches"][0]
-            print(f"    → {top['policy_id']} (chunk {top['chunk_index']}): "
+            page = f", p. {top['page']}" if top.get("page") else ""
+            print(f"    → {top['policy_id']} (chunk {top['chunk_index']}{page}): "
                   f"{top['similarity']:.3f}")
             snippet = textwrap.shorten(top["snippet"], width=80, placeholder="...")
             print(f"      \"{snippet}\"")
@@ -0,0 +1,84 @@
+"""Shared fixtures for the pipeline tests."""
+from pathlib import Path
+
+import pytest
+
+
+def write_pdf(path: Path, pages: list[str]):
+    """Write a minimal PDF with one line of Helvetica text per page ("" = blank page)."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        content = f"BT /F1 10 Tf 20 700 Td ({escaped}) Tj ET".encode("latin-1") if text else b""
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                       % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(bytes(out))
+
+
+@pytest.fixture
+def make_pdf():
+    return write_pdf
+
+
+class FakeCollection:
+    """In-memory stand-in for the parts of a Chroma collection the pipeline uses."""
+
+    def __init__(self, name: str = "test"):
+        self.name = name
+        self.metadata = {}
+        self.rows = {}
+        self.fail_writes = 0
+
+    def count(self) -> int:
+        return len(self.rows)
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=()):
+        keys = [k for k in self.rows if (ids is None or k in ids) and all(
+            self.rows[k]["metadata"].get(field) == value for field, value in (where or {}).items())]
+        keys = keys[offset:None if limit is None else offset + limit]
+        return {
+            "ids": keys,
+            "metadatas": [dict(self.rows[k]["metadata"]) for k in keys],
+            "documents": [self.rows[k]["document"] for k in keys],
+            "embeddings": [self.rows[k]["embedding"] for k in keys],
+        }
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise ConnectionError("write failed")
+        for i, d, m, e in zip(ids, documents, metadatas, embeddings):
+            self.rows[i] = {"document": d, "metadata": dict(m), "embedding": list(e)}
+
+    add = upsert
+
+    def delete(self, ids):
+        for i in ids:
+            self.rows.pop(i, None)
+
+    def modify(self, metadata):
+        self.metadata = metadata
+
+
+@pytest.fixture
+def fake_collection():
+    return FakeCollection
@@ -0,0 +1,130 @@
+"""Char, token and sentence chunking."""
+import random
+
+import numpy as np
+import pytest
+
+from pipeline import chunking
+from pipeline.ingest import chunk_text
+
+
+def _chunk_text_reference(text, chunk_size, overlap):
+    """The slice-and-strip chunker that chunk_spans replaced."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        chunk = text[start:start + chunk_size]
+        if chunk.strip():
+            chunks.append(chunk.strip())
+        start += chunk_size - overlap
+    return chunks
+
+
+def _random_text(rng, n):
+    pieces = ["política", "IA", "educación", " ", "  ", "\n\n", "\t", ".", "ção", "x" * 30]
+    return "".join(rng.choice(pieces) for _ in range(n))
+
+
+@pytest.mark.parametrize("chunk_size, overlap", [(800, 200), (50, 10), (7, 3), (10, 0)])
+def test_chunk_spans_match_reference(chunk_size, overlap):
+    rng = random.Random(chunk_size)
+    texts = ["", "   ", "short", " padded  ", "a" * 2000] + [
+        _random_text(rng, rng.randrange(1, 400)) for _ in range(200)]
+    for text in texts:
+        chunks = chunking.make_chunks(text, chunk_size, overlap)
+        assert list(chunks) == _chunk_text_reference(text, chunk_size, overlap)
+        assert chunk_text(text, chunk_size, overlap) == list(chunks)
+        assert chunks.spans.dtype == np.int32
+        assert chunks[1:3] == list(chunks)[1:3]
+
+
+def test_chunk_spans_rejects_overlap_not_below_size():
+    with pytest.raises(ValueError):
+        chunking.chunk_spans("text", 10, 10)
+
+
+def test_chunk_ids_are_positional():
+    assert chunking.chunk_ids("cl_policy", 2) == ["cl_policy_chunk_0000", "cl_policy_chunk_0001"]
+
+
+WORDS = ("La política nacional de inteligencia artificial establece principios para "
+         "la educación superior y la formación docente en todas las regiones.").split()
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    """A small WordPiece tokenizer with [CLS]/[SEP], trained offline on WORDS."""
+    tokenizers = pytest.importorskip("tokenizers")
+    transformers = pytest.importorskip("transformers")
+    tok = tokenizers.Tokenizer(tokenizers.models.WordPiece(unk_token="[UNK]"))
+    tok.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tok.train_from_iterator([" ".join(WORDS)] * 10, tokenizers.trainers.WordPieceTrainer(
+        vocab_size=80, special_tokens=["[UNK]", "[CLS]", "[SEP]", "[PAD]"]))
+    tok.post_processor = tokenizers.processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        special_tokens=[("[CLS]", tok.token_to_id("[CLS]")), ("[SEP]", tok.token_to_id("[SEP]"))])
+    return transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tok, unk_token="[UNK]", cls_token="[CLS]", sep_token="[SEP]",
+        pad_token="[PAD]")
+
+
+@pytest.mark.parametrize("max_tokens, overlap", [(128, 32), (16, 4)])
+def test_token_chunks_fit_the_window(tokenizer, max_tokens, overlap):
+    rng = random.Random(max_tokens)
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randrange(1, 300))) for _ in range(30)]
+    for chunks in chunking.make_token_chunks(texts, tokenizer, max_tokens, overlap):
+        text = chunks.text
+        covered = np.zeros(len(text), dtype=bool)
+        for start, end in chunks.spans.tolist():
+            assert len(tokenizer(text[start:end])["input_ids"]) <= max_tokens
+            covered[start:end] = True
+        assert all(covered[i] for i, c in enumerate(text) if not c.isspace())
+        assert chunking.truncation_loss(chunks, tokenizer, max_tokens)["truncated"] == 0
+
+
+def _sentences(text):
+    return [text[start:end] for start, end in chunking.iter_sentence_spans(text)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("La IA avanza. Los docentes se forman.", ["La IA avanza.", "Los docentes se forman."]),
+    ("¿Qué hará el Estado? ¡Invertir! «Ya» dijo.", ["¿Qué hará el Estado?", "¡Invertir!",
+                                                    "«Ya» dijo."]),
+    ("Ver el art. 5 de la ley. El Dr. Pérez firmó.", ["Ver el art. 5 de la ley.",
+                                                      "El Dr. Pérez firmó."]),
+    ("Acordo com EE.UU. Sobre dados. Fim.", ["Acordo com EE.UU. Sobre dados.", "Fim."]),
+    ("Signed by J. Smith in the U.S. Today it applies.",
+     ["Signed by J. Smith in the U.S. Today it applies."]),
+    ("A política (2021). Outra frase…  Última.", ["A política (2021).", "Outra frase…", "Última."]),
+    ("Ends without a period", ["Ends without a period"]),
+    ("Version 2.0 is out. numbers 3.5 stay.", ["Version 2.0 is out. numbers 3.5 stay."]),
+])
+def test_sentence_boundaries(text, expected):
+    assert _sentences(text) == expected
+
+
+@pytest.mark.parametrize("overlap", [0, 1])
+def test_sentence_chunks_hold_whole_sentences(overlap):
+    rng = random.Random(overlap)
+    # No one-letter words: "y." would read as an initial
+    words = [w.strip(".").lower() for w in WORDS if len(w) > 2]
+    sentences = [" ".join(rng.choice(words) for _ in range(rng.randrange(2, 25))).capitalize() + "."
+                 for _ in range(300)]
+    text = " ".join(sentences)
+    chunks = chunking.make_sentence_chunks(text, max_chars=400, overlap=overlap)
+    boundaries = {start for start, _ in chunking.iter_sentence_spans(text)}
+    boundaries |= {end for _, end in chunking.iter_sentence_spans(text)}
+    for start, end in chunks.spans.tolist():
+        assert end - start <= 400
+        assert start in boundaries and end in boundaries
+    if overlap:
+        assert any(a[1] > b[0] for a, b in zip(chunks.spans.tolist(), chunks.spans.tolist()[1:]))
+    else:
+        assert " ".join(chunks) == text
+
+
+def test_long_sentence_is_cut_at_spaces():
+    text = " ".join(["palabra"] * 200) + "."
+    chunks = chunking.make_sentence_chunks(text, max_chars=100)
+    assert all(len(chunk) <= 100 and not chunk.startswith(" ") for chunk in chunks)
+    assert " ".join(chunks) == text
@@ -0,0 +1,47 @@
+"""clean_text against the original five-pass cleaner, and StreamingCleaner."""
+import random
+
+import pytest
+
+from pipeline.bench import _clean_text_multipass
+from pipeline.preprocess import StreamingCleaner, clean_text
+
+# Fragments that make the cleaning rules match, and run into each other
+_PIECES = ["....", ".", "..", "12", "3", "1234", " | ", "|", " ", "\n", "\t", "Page", "page ",
+           "PAGE 4 of 10", " of ", "of", "Pa", "ge", "e", "f", "x", "_", "\x00", "\x07", "\x1f",
+           "\x0b", "ñ", "á"]
+
+
+def _random_text(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice(_PIECES) for _ in range(n))
+
+
+@pytest.mark.parametrize("text", [
+    "....12 | ....",
+    "Pa12 | ge 3 of 4",
+    "Page 1 of 12 | x",
+    "index ........ 7 | next",
+    "a1 | b 22|c",
+    "\x00Page 3\tof 9\x1b done ",
+])
+def test_clean_text_matches_multipass_on_spliced_artifacts(text):
+    assert clean_text(text) == _clean_text_multipass(text)
+
+
+def test_clean_text_matches_multipass_fuzz():
+    rng = random.Random(0)
+    for _ in range(3000):
+        text = _random_text(rng, rng.randint(0, 40))
+        assert clean_text(text) == _clean_text_multipass(text), repr(text)
+
+
+def test_streaming_cleaner_matches_clean_text():
+    rng = random.Random(1)
+    for _ in range(500):
+        pages = [_random_text(rng, rng.randint(0, 25)) for _ in range(rng.randint(1, 6))]
+        cleaner = StreamingCleaner()
+        out = "".join(cleaner.feed(page) for page in pages) + cleaner.close()
+        assert out == clean_text("\n\n".join(page for page in pages if page)), repr(pages)
+        assert cleaner.n_chars == len(out)
+        assert len(cleaner.page_offsets) == len(pages)
+        assert cleaner.page_offsets == sorted(cleaner.page_offsets)
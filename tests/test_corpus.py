@@ -0,0 +1,88 @@
+"""Paged corpus fetch and policy centroids."""
+import random
+
+import numpy as np
+
+from pipeline import similarity
+from pipeline.corpus import fetch_corpus, load_corpus, load_snapshot
+from pipeline.ingest import delete_stale, write_prepared
+
+N_CHUNKS = {"pa": 5, "pb": 1, "pc": 7}
+
+
+def _fill(collection, dim=4, seed=0):
+    """Upsert chunks of several policies, interleaved and out of chunk order."""
+    rng = random.Random(seed)
+    rows = [(pid, i) for pid, n in N_CHUNKS.items() for i in range(n)]
+    rng.shuffle(rows)
+    vectors = {row: np.random.default_rng(k).normal(size=dim).astype(np.float32)
+               for k, row in enumerate(sorted(rows))}
+    collection.upsert(
+        ids=[f"{pid}_chunk_{i:04d}" for pid, i in rows],
+        documents=[f"{pid} text {i}" for pid, i in rows],
+        metadatas=[{"policy_id": pid, "chunk_index": i} for pid, i in rows],
+        embeddings=[vectors[row] for row in rows],
+    )
+    return vectors
+
+
+def test_fetch_corpus_pages_and_groups(fake_collection):
+    collection = fake_collection()
+    vectors = _fill(collection)
+    for page_size in (1, 3, 100):
+        corpus = fetch_corpus(collection, page_size=page_size, include_documents=True)
+        assert sorted(corpus.policy_ids) == ["pa", "pb", "pc"]
+        assert corpus.vectors.flags.c_contiguous and corpus.vectors.dtype == np.float32
+        for pid, n in N_CHUNKS.items():
+            start, end = corpus.span(pid)
+            assert end - start == n
+            assert corpus.chunk_ids[start:end] == [f"{pid}_chunk_{i:04d}" for i in range(n)]
+            assert corpus.documents[start:end] == [f"{pid} text {i}" for i in range(n)]
+            np.testing.assert_array_equal(corpus.rows(pid),
+                                          np.stack([vectors[(pid, i)] for i in range(n)]))
+
+
+def test_fetch_empty_collection(fake_collection):
+    corpus = fetch_corpus(fake_collection())
+    assert len(corpus) == 0 and corpus.chunk_ids == []
+
+
+def test_centroids_respect_an_explicit_empty_selection(fake_collection):
+    collection = fake_collection()
+    _fill(collection)
+    corpus = fetch_corpus(collection, page_size=4)
+
+    centroids, ids = corpus.centroids()
+    assert ids == corpus.policy_ids
+    np.testing.assert_allclose(centroids[ids.index("pc")],
+                               corpus.rows("pc").astype(np.float64).mean(axis=0))
+    empty, none = corpus.centroids([])
+    assert none == [] and empty.shape == (0, corpus.dim)
+
+    matrix, ids = similarity.compute_similarity_matrix(collection, [], corpus)
+    assert ids == [] and matrix.shape == (0, 0)
+    assert similarity.compute_dimension_scores(collection, [], corpus) == {}
+
+
+def _policy(vectors):
+    n = len(vectors)
+    return {"policy_id": "pa", "ids": [f"pa_chunk_{i:04d}" for i in range(n)],
+            "documents": [f"text {i}" for i in range(n)],
+            "metadatas": [{"policy_id": "pa", "chunk_index": i} for i in range(n)],
+            "embeddings": np.asarray(vectors, dtype=np.float32)}
+
+
+def test_rewriting_the_same_ids_invalidates_the_snapshot(fake_collection, tmp_path):
+    collection = fake_collection()
+    write_prepared(collection, [_policy(np.ones((3, 4)))], upsert=True)
+    np.testing.assert_array_equal(load_corpus(collection, tmp_path).vectors, np.ones((3, 4)))
+
+    # Re-embedded under the same IDs: same count, new vectors
+    write_prepared(collection, [_policy(np.full((3, 4), 2.0))], upsert=True)
+    assert load_snapshot(collection, tmp_path) is None
+    np.testing.assert_array_equal(load_corpus(collection, tmp_path).vectors,
+                                  np.full((3, 4), 2.0))
+
+    assert delete_stale(collection, [{"stale_ids": ["pa_chunk_0002"]}]) == 1
+    assert load_snapshot(collection, tmp_path) is None
+    assert load_corpus(collection, tmp_path).chunk_ids == ["pa_chunk_0000", "pa_chunk_0001"]
@@ -0,0 +1,72 @@
+"""EmbeddingCache persistence, LRU eviction and the caching embedding function."""
+import numpy as np
+
+from pipeline.embedding_cache import CachedEmbeddingFunction, EmbeddingCache, text_key
+
+DIM = 4
+
+
+def _vectors(n, start=0):
+    return np.arange(start * DIM, (start + n) * DIM, dtype=np.float32).reshape(n, DIM)
+
+
+def _keys(n, start=0):
+    return [text_key(f"text {i}") for i in range(start, start + n)]
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = EmbeddingCache("model", root=tmp_path)
+    cache.put(_keys(3), _vectors(3))
+    cache.save()
+    reloaded = EmbeddingCache("model", root=tmp_path)
+    found = reloaded.get(_keys(4))
+    assert found[3] is None
+    np.testing.assert_array_equal(np.stack(found[:3]), _vectors(3))
+    assert text_key("a  b\n") == text_key("a b")
+
+
+def test_hits_do_not_rewrite_the_index(tmp_path):
+    cache = EmbeddingCache("model", root=tmp_path)
+    cache.put(_keys(3), _vectors(3))
+    cache.save()
+    index = tmp_path / "model" / "index.npz"
+    inode = index.stat().st_ino
+    cache.get(_keys(3))
+    cache.save()
+    assert index.stat().st_ino == inode
+
+    cache.put(_keys(1, start=3), _vectors(1, start=3))
+    cache.save()
+    assert index.stat().st_ino != inode
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    cache = EmbeddingCache("model", root=tmp_path, max_bytes=10 * DIM * 4)
+    cache.put(_keys(10), _vectors(10))
+    cache.get(_keys(5))  # 0-4 now more recent than 5-9
+    cache.put(_keys(3, start=10), _vectors(3, start=10))
+    cache.save()
+
+    assert len(cache) <= cache.max_rows == 10
+    reloaded = EmbeddingCache("model", root=tmp_path, max_bytes=10 * DIM * 4)
+    found = reloaded.get(_keys(13))
+    assert all(v is not None for v in found[:5] + found[10:])
+    assert any(v is None for v in found[5:10])
+    for i, vector in enumerate(found):
+        if vector is not None:
+            np.testing.assert_array_equal(vector, _vectors(1, start=i)[0])
+
+
+def test_cached_function_embeds_only_misses(tmp_path):
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return np.array([[len(t), 0, 0, 1] for t in texts], dtype=np.float32)
+
+    fn = CachedEmbeddingFunction(lambda: embed, "model", EmbeddingCache("model", root=tmp_path))
+    first = fn(["a", "bb"])
+    second = fn(["bb", "ccc", "a"])
+    assert calls == [["a", "bb"], ["ccc"]]
+    np.testing.assert_array_equal(np.stack(second), embed(["bb", "ccc", "a"]))
+    np.testing.assert_array_equal(np.stack(first), embed(["a", "bb"]))
@@ -0,0 +1,141 @@
+"""Token-budgeted batching of local embedding inputs, and the ONNX export checks."""
+import json
+import os
+import random
+import time
+
+import numpy as np
+import pytest
+
+from pipeline import embeddings
+from pipeline.embeddings import token_budget_batches
+
+
+def test_batches_cover_inputs_within_budget():
+    rng = random.Random(0)
+    lengths = [rng.randrange(3, 129) for _ in range(1000)]
+    batches = token_budget_batches(lengths, batch_tokens=2048, max_batch_size=64)
+    indices = np.concatenate(batches)
+    assert sorted(indices.tolist()) == list(range(len(lengths)))
+    for batch in batches:
+        longest = max(lengths[i] for i in batch)
+        assert len(batch) <= 64
+        assert len(batch) * longest <= 2048 or len(batch) == 1
+
+
+def test_batches_group_similar_lengths():
+    lengths = [120, 5, 118, 6, 7, 119]
+    batches = token_budget_batches(lengths, batch_tokens=360, max_batch_size=8)
+    assert [sorted(b.tolist()) for b in batches] == [[1, 3, 4], [0, 2, 5]]
+
+
+def test_input_longer_than_budget_gets_its_own_batch():
+    batches = token_budget_batches([10, 500, 10], batch_tokens=100, max_batch_size=8)
+    assert [b.tolist() for b in batches] == [[0, 2], [1]]
+
+
+def test_hash_embeddings_are_deterministic_unit_vectors():
+    fn = embeddings.HashEmbeddingFunction(dim=64)
+    texts = ["Política de IA", " Política  de\tIA ", "Teacher training", ""]
+    first, again = np.stack(fn(texts)), np.stack(embeddings.HashEmbeddingFunction(dim=64)(texts))
+    assert first.shape == (4, 64) and first.dtype == np.float32
+    np.testing.assert_array_equal(first, again)
+    np.testing.assert_allclose(np.linalg.norm(first, axis=1), 1.0, rtol=1e-6)
+    # Texts equal after whitespace normalization share a vector; others differ
+    np.testing.assert_array_equal(first[0], first[1])
+    assert not np.allclose(first[0], first[2])
+    assert fn([]) == []
+
+
+def _late_first_shard(texts):
+    """_embed_shard stand-in (imported by the pool workers): earlier shards finish later."""
+    shard = int(texts[0].split()[1]) // 3
+    time.sleep(0.05 * (10 - shard))
+    with open(os.environ["SHARD_LOG"], "a") as f:
+        f.write(f"{shard}\n")
+    return np.stack(embeddings.HashEmbeddingFunction(dim=8)(texts))
+
+
+def test_embedding_pool_keeps_input_order(monkeypatch, tmp_path):
+    log = tmp_path / "shards.log"
+    monkeypatch.setenv("SHARD_LOG", str(log))
+    monkeypatch.setattr(embeddings, "_embed_shard", _late_first_shard)
+    texts = [f"text {i}" for i in range(30)]
+    with embeddings.EmbeddingPool(workers=4, threads=1, shard_size=3, backend="hash") as pool:
+        vectors = pool(texts)
+
+    finished = [int(line) for line in log.read_text().split()]
+    assert sorted(finished) == list(range(10)) and finished != sorted(finished)
+    np.testing.assert_array_equal(np.stack(vectors),
+                                  np.stack(embeddings.HashEmbeddingFunction(dim=8)(texts)))
+
+
+@pytest.fixture
+def onnx_vectors(monkeypatch):
+    """Fake ONNX sessions: _mean_pooled returns vectors[path] for the sample texts."""
+    vectors = {}
+    monkeypatch.setattr(embeddings, "get_local_tokenizer", lambda name: None)
+    monkeypatch.setattr(embeddings, "local_max_seq_length", lambda name: 128)
+    monkeypatch.setattr(embeddings, "_onnx_session", lambda path: path)
+    monkeypatch.setattr(embeddings, "_mean_pooled",
+                        lambda session, tokenizer, texts, max_length: vectors[session])
+    return vectors
+
+
+def _sample_vectors(seed: int = 0) -> np.ndarray:
+    n = len(embeddings._QUANTIZE_CHECK_TEXTS)
+    return np.random.default_rng(seed).standard_normal((n, 16))
+
+
+def test_check_quantized_accepts_a_faithful_model(onnx_vectors):
+    fp32 = _sample_vectors()
+    onnx_vectors.update({"fp32": fp32, "int8": fp32 + 1e-3 * _sample_vectors(1)})
+    result = embeddings.check_quantized("m", "fp32", "int8")
+    assert result["cosine"] > 0.99 and result["spearman"] > 0.99
+
+
+def test_check_quantized_rejects_reordered_similarities(onnx_vectors):
+    # Close vectors (cosine > 0.99) whose pairwise similarities rank differently
+    fp32 = 1.0 + 0.1 * _sample_vectors()
+    onnx_vectors.update({"fp32": fp32, "int8": fp32 + 0.05 * _sample_vectors(2)})
+    with pytest.raises(RuntimeError, match="Spearman 0.8"):
+        embeddings.check_quantized("m", "fp32", "int8")
+
+
+def test_export_onnx_rechecks_an_unrecorded_int8_model(onnx_vectors, tmp_path):
+    target = tmp_path / "m"
+    target.mkdir()
+    (target / "model.onnx").touch()
+    int8_path = target / "model.int8.onnx"
+    int8_path.touch()
+    fp32 = _sample_vectors()
+    onnx_vectors.update({target / "model.onnx": fp32, int8_path: fp32[::-1]})
+
+    with pytest.raises(RuntimeError):
+        embeddings.export_onnx("m", quantize=True, out_dir=tmp_path)
+    assert not int8_path.exists()
+
+    int8_path.touch()
+    onnx_vectors[int8_path] = fp32
+    assert embeddings.export_onnx("m", quantize=True, out_dir=tmp_path) == int8_path
+    record = json.loads((target / "model.int8.check.json").read_text(encoding="utf-8"))
+    assert record["min_spearman"] == embeddings.ONNX_MIN_SPEARMAN
+
+
+def test_local_max_seq_length_reads_the_sentence_transformers_config(monkeypatch, tmp_path):
+    pytest.importorskip("huggingface_hub")
+    config = tmp_path / "sentence_bert_config.json"
+    config.write_text(json.dumps({"max_seq_length": 128, "do_lower_case": False}))
+    requested = []
+
+    def fake_download(repo_id, filename):
+        requested.append((repo_id, filename))
+        return str(config)
+
+    monkeypatch.setattr("huggingface_hub.hf_hub_download", fake_download)
+    embeddings.local_max_seq_length.cache_clear()
+    try:
+        assert embeddings.local_max_seq_length("some-model") == 128
+    finally:
+        embeddings.local_max_seq_length.cache_clear()
+    assert requested == [("sentence-transformers/some-model", "sentence_bert_config.json")]
@@ -0,0 +1,128 @@
+"""Incremental ingest against a local and a cloud collection."""
+import time
+
+import numpy as np
+
+from pipeline import ingest
+from pipeline.ingest import CloudSync, ingest_incremental, prepare_policy
+
+POLICY = {"country": "Chile", "region": "LATAM", "year": 2024, "language": "en"}
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, documents):
+        self.calls.append(len(documents))
+        return np.array([[len(d), d.count(" ") + 1.0] for d in documents], dtype=np.float32)
+
+
+def _prepared(text="Artificial intelligence in schools. " * 200):
+    return prepare_policy("zz_test_policy", POLICY, text)
+
+
+def test_unchanged_policy_is_not_embedded_again(fake_collection):
+    local, embed = fake_collection(), CountingEmbedder()
+    first = ingest_incremental([_prepared()], local, embed)
+    second = ingest_incremental([_prepared()], local, embed)
+    assert first["chunks"] == local.count() > 0
+    assert second["chunks"] == 0 and second["unchanged"] == local.count()
+    assert embed.calls == [local.count()]
+
+
+def test_cloud_is_diffed_separately(fake_collection):
+    local, cloud, embed = fake_collection(), fake_collection(), CountingEmbedder()
+    ingest_incremental([_prepared()], local, embed)
+    assert cloud.count() == 0
+
+    # Up to date locally, but a new cloud collection must still receive every chunk
+    sync = CloudSync(cloud, retries=0)
+    stats = ingest_incremental([_prepared()], local, embed, sync=sync)
+    report = sync.drain()
+    assert stats["chunks"] == 0
+    assert report["failed"] == {} and report["chunks"] == local.count()
+    assert cloud.get()["ids"] == local.get()["ids"]
+    assert cloud.get()["embeddings"] == local.get()["embeddings"]
+
+
+def test_stale_chunks_are_deleted(fake_collection):
+    local, embed = fake_collection(), CountingEmbedder()
+    ingest_incremental([_prepared()], local, embed)
+    before = local.count()
+    stats = ingest_incremental([_prepared("Short policy text. " * 20)], local, embed)
+    assert stats["deleted"] == before - local.count() > 0
+
+
+def test_cloud_sync_retries_and_reports(fake_collection):
+    local, cloud, embed = fake_collection(), fake_collection(), CountingEmbedder()
+    cloud.fail_writes = 1
+    sync = CloudSync(cloud, retries=1, backoff=0)
+    ingest_incremental([_prepared()], local, embed, sync=sync)
+    report = sync.drain()
+    assert report["synced"] == ["zz_test_policy"] and report["failed"] == {}
+    assert cloud.get()["ids"] == local.get()["ids"]
+
+    sync = CloudSync(cloud, retries=0)
+    ingest_incremental([_prepared()], local, embed, sync=sync)
+    assert sync.drain()["current"] == ["zz_test_policy"]
+
+
+def test_failed_cloud_push_is_retried_next_run(fake_collection):
+    local, cloud, embed = fake_collection(), fake_collection(), CountingEmbedder()
+    cloud.fail_writes = 1
+    sync = CloudSync(cloud, retries=0)
+    ingest_incremental([_prepared()], local, embed, sync=sync)
+    assert list(sync.drain()["failed"]) == ["zz_test_policy"]
+    assert cloud.count() == 0
+
+    sync = CloudSync(cloud, retries=0)
+    ingest_incremental([_prepared()], local, embed, sync=sync)
+    report = sync.drain()
+    assert report["synced"] == ["zz_test_policy"] and report["failed"] == {}
+    assert cloud.get()["ids"] == local.get()["ids"]
+
+
+def test_unreachable_cloud_does_not_delay_the_local_write(fake_collection):
+    class Unreachable(fake_collection):
+        def get(self, *args, **kwargs):
+            raise ConnectionError("cloud unreachable")
+
+    local, embed = fake_collection(), CountingEmbedder()
+    policies = [prepare_policy(f"zz_test_{k}", POLICY, "Schools and AI. " * 100) for k in range(3)]
+    sync = CloudSync(Unreachable(), retries=3, backoff=0.2)
+    t0 = time.perf_counter()
+    stats = ingest_incremental(policies, local, embed, sync=sync)
+    assert time.perf_counter() - t0 < 0.2  # the first probe alone backs off 1.4 s
+    assert stats["chunks"] == local.count() > 0
+
+    report = sync.drain()
+    assert sorted(report["failed"]) == [p["policy_id"] for p in policies]
+    assert sum("cloud unavailable" in error for error in report["failed"].values()) >= 1
+    assert report["synced"] == []
+
+
+class FakeClient:
+    def __init__(self, collections):
+        self.collections = {c.name: c for c in collections}
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+
+def test_legacy_collection_is_noted_and_dropped(fake_collection, monkeypatch):
+    legacy = fake_collection(ingest.COLLECTION_NAME)
+    legacy.upsert(["a", "b"], ["x", "y"], [{}, {}], [[0.0], [1.0]])
+    local, cloud = FakeClient([legacy]), FakeClient([])
+    assert "(2 chunks)" in ingest.legacy_collection_note(local, "Local ChromaDB")
+    assert ingest.legacy_collection_note(cloud, "Chroma Cloud") is None
+
+    monkeypatch.setattr(ingest, "get_chroma_client", lambda: local)
+    monkeypatch.setattr(ingest, "get_chroma_cloud_client", lambda: cloud)
+    monkeypatch.setattr(ingest, "cloud_configured", lambda: True)
+    assert ingest.drop_legacy_collections() == ["local"]
+    assert local.collections == {}
+    assert ingest.drop_legacy_collections() == []
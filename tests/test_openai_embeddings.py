@@ -0,0 +1,156 @@
+"""AsyncOpenAIEmbeddingFunction against a local stub of the embeddings endpoint."""
+import json
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+pytest.importorskip("openai")
+
+from pipeline import openai_embeddings  # noqa: E402
+from pipeline.embedding_cache import (  # noqa: E402
+    CachedEmbeddingFunction, EmbeddingCache, PartialEmbeddingError, text_key,
+)
+from pipeline.openai_embeddings import AsyncOpenAIEmbeddingFunction  # noqa: E402
+
+
+def stub_vector(text: str, dim: int = 8) -> np.ndarray:
+    return np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(dim)
+
+
+class _EmbeddingsStub(BaseHTTPRequestHandler):
+    """Imitates POST /v1/embeddings; server.fail(inputs) may answer with an error instead."""
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: dict, headers: dict | None = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        stub = self.server
+        inputs = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["input"]
+        with stub.lock:
+            stub.log.append((time.monotonic(), inputs[0]))
+            failure = stub.fail(inputs)
+            if failure is None:
+                stub.embedded.update(inputs)
+        if failure is not None:
+            status, headers = failure
+            self._reply(status, {"error": {"message": "stub error", "type": "stub"}}, headers)
+            return
+        self._reply(200, {
+            "object": "list",
+            "model": "stub",
+            "data": [{"object": "embedding", "index": i, "embedding": stub_vector(t).tolist()}
+                     for i, t in enumerate(inputs)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fail):
+        super().__init__(("127.0.0.1", 0), _EmbeddingsStub)
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.log = []  # (arrival time, first input) per request
+        self.embedded = Counter()
+        self.attempts = Counter()
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Start a StubServer with the given failure rule; returns (server, client factory)."""
+    monkeypatch.setattr(openai_embeddings, "_BACKOFF_BASE", 0.01)
+    servers = []
+
+    def start(fail):
+        server = StubServer(fail)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+
+        def client(**kwargs):
+            return AsyncOpenAIEmbeddingFunction(
+                api_key="stub", model_name="text-embedding-3-small",
+                base_url=f"http://127.0.0.1:{server.server_port}/v1", **kwargs)
+        return server, client
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+TEXTS = [f"chunk {i} about AI in education" for i in range(40)]
+
+
+def test_failed_batches_are_retried_alone(serve):
+    def fail(inputs):
+        # Every batch fails its first attempt, alternating 429 and 5xx
+        key = inputs[0]
+        server.attempts[key] += 1
+        if server.attempts[key] == 1:
+            return (429, {"retry-after-ms": "10"}) if len(server.attempts) % 2 else (503, {})
+        return None
+
+    server, client = serve(fail)
+    fn = client(max_concurrency=4, max_inputs=5, max_retries=3)
+    vectors = fn(TEXTS)
+    assert len(server.attempts) == 8 and set(server.attempts.values()) == {2}
+    assert all(server.embedded[t] == 1 for t in TEXTS)
+    np.testing.assert_allclose(np.stack(vectors), np.stack([stub_vector(t) for t in TEXTS]),
+                               rtol=1e-6)
+    assert fn.requests == 8 and fn.retries == 8
+
+
+def test_retry_after_is_honoured(serve):
+    def fail(inputs):
+        server.attempts[inputs[0]] += 1
+        if inputs[0] == TEXTS[0] and server.attempts[inputs[0]] == 1:
+            return 429, {"retry-after-ms": "800"}
+        return None
+
+    server, client = serve(fail)
+    client(max_concurrency=1, max_inputs=10, max_retries=3)(TEXTS)
+    (t_429, first), *later = server.log
+    assert first == TEXTS[0]
+    # No sender may call again before the requested pause is over
+    assert min(t for t, _ in later) - t_429 >= 0.75
+
+
+def test_partial_failure_keeps_the_vectors_that_succeeded(serve, tmp_path):
+    poisoned = {"on": True}
+
+    def fail(inputs):
+        return (500, {}) if poisoned["on"] and TEXTS[20] in inputs else None
+
+    server, client = serve(fail)
+    cache = EmbeddingCache("stub", root=tmp_path)
+    fn = CachedEmbeddingFunction(lambda: client(max_concurrency=2, max_inputs=10, max_retries=1),
+                                 "stub", cache)
+    with pytest.raises(PartialEmbeddingError) as excinfo:
+        fn(TEXTS)
+    assert sorted(excinfo.value.vectors) == list(range(20)) + list(range(30, 40))
+
+    stored = EmbeddingCache("stub", root=tmp_path).get([text_key(t) for t in TEXTS])
+    assert [i for i, v in enumerate(stored) if v is None] == list(range(20, 30))
+    np.testing.assert_allclose(stored[0], stub_vector(TEXTS[0]), rtol=1e-6)
+
+    poisoned["on"] = False
+    vectors = fn(TEXTS)
+    assert all(server.embedded[t] == 1 for t in TEXTS)
+    np.testing.assert_allclose(np.stack(vectors), np.stack([stub_vector(t) for t in TEXTS]),
+                               rtol=1e-6)
@@ -0,0 +1,162 @@
+"""End-to-end preprocessing of small generated PDFs."""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from pipeline import preprocess
+
+SENTENCE = "Artificial intelligence in education requires teacher training and clear rules. "
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    raw, processed = tmp_path / "raw", tmp_path / "processed"
+    monkeypatch.setattr(preprocess, "RAW_DIR", raw)
+    monkeypatch.setattr(preprocess, "PROCESSED_DIR", processed)
+    monkeypatch.setattr(preprocess, "PREPROCESS_MANIFEST", processed / "manifest.json")
+    preprocess.load_page_offsets.cache_clear()
+    yield raw, processed
+    preprocess.load_page_offsets.cache_clear()
+
+
+def test_build_policy_id():
+    assert preprocess.build_policy_id("australia", "ai_action_plan_2021.pdf") == \
+        "australia_ai_action_plan_2021"
+
+
+def test_preprocess_all_extracts_and_skips(dirs, make_pdf):
+    raw, processed = dirs
+    make_pdf(raw / "brazil" / "ebia_2021.pdf", [SENTENCE * 5, "", SENTENCE * 5])
+    make_pdf(raw / "chile" / "short.pdf", ["Too short."])
+
+    results = preprocess.preprocess_all(page_workers=1, page_cache=False)
+    assert results["processed"] == ["brasil_ebia_2021"]
+    assert [pid for pid, _ in results["failed"]] == ["chile_short"]
+
+    text = (processed / "brasil_ebia_2021.txt").read_text(encoding="utf-8")
+    assert text == preprocess.clean_text("\n\n".join([SENTENCE * 5, SENTENCE * 5]))
+    offsets = preprocess.load_page_offsets("brasil_ebia_2021")
+    assert list(offsets) == [0, len(SENTENCE * 5), len(SENTENCE * 5)]
+
+    again = preprocess.preprocess_all(page_workers=1, page_cache=False)
+    assert again["skipped"] == ["brasil_ebia_2021"]
+    assert again["processed"] == []
+
+
+def test_preprocess_all_rebuilds_changed_documents_only(dirs, make_pdf, monkeypatch):
+    raw, _ = dirs
+    make_pdf(raw / "chile" / "plan.pdf", [SENTENCE * 10])
+    make_pdf(raw / "chile" / "guide.pdf", [SENTENCE * 10])
+    first = preprocess.preprocess_all(page_workers=1, page_cache=False)
+    assert first["reasons"] == {"chile_guide": "new", "chile_plan": "new"}
+
+    make_pdf(raw / "chile" / "plan.pdf", [SENTENCE * 12])
+    changed = preprocess.preprocess_all(page_workers=1, page_cache=False)
+    assert changed["reasons"] == {"chile_plan": "source PDF changed"}
+    assert changed["skipped"] == ["chile_guide"]
+    assert changed["processed"] == ["chile_plan"]
+
+    reason = f"cleaner v{preprocess.CLEANER_VERSION} -> vtest"
+    monkeypatch.setattr(preprocess, "CLEANER_VERSION", "test")
+    bumped = preprocess.preprocess_all(page_workers=1, page_cache=False)
+    assert bumped["reasons"] == {"chile_guide": reason, "chile_plan": reason}
+    manifest = preprocess.load_manifest()["documents"]
+    assert {entry["cleaner_version"] for entry in manifest.values()} == {"test"}
+
+    unchanged = preprocess.preprocess_all(page_workers=1, page_cache=False)
+    assert unchanged["reasons"] == {}
+    assert unchanged["skipped"] == ["chile_guide", "chile_plan"]
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="the patched process_pdf must reach the workers")
+def test_preprocess_all_workers_time_out_a_hung_document(dirs, make_pdf, monkeypatch):
+    raw, processed = dirs
+    for name in ("a_slow", "b_hung", "c_fast", "d_fast"):
+        make_pdf(raw / "canada" / f"{name}.pdf", [SENTENCE * 10])
+    delays = {"a_slow.pdf": 0.5, "b_hung.pdf": 60}
+    process_pdf = preprocess.process_pdf
+
+    def delayed_process_pdf(pdf_path, *args, **kwargs):
+        time.sleep(delays.get(pdf_path.name, 0))
+        return process_pdf(pdf_path, *args, **kwargs)
+
+    monkeypatch.setattr(preprocess, "process_pdf", delayed_process_pdf)
+    started = time.monotonic()
+    results = preprocess.preprocess_all(workers=4, timeout=2, page_workers=1, page_cache=False)
+    assert time.monotonic() - started < 30
+    # a_slow finishes after c_fast and d_fast, but the summary keeps input order
+    assert results["processed"] == ["canada_a_slow", "canada_c_fast", "canada_d_fast"]
+    assert results["failed"] == [("canada_b_hung", "Timed out after 2s")]
+    assert not (processed / "canada_b_hung.txt").exists()
+    assert not list(processed.glob("*.tmp"))
+
+    delays.clear()
+    again = preprocess.preprocess_all(workers=4, timeout=2, page_workers=1, page_cache=False)
+    assert again["reasons"] == {"canada_b_hung": "new"}
+    assert again["processed"] == ["canada_b_hung"]
+    assert again["skipped"] == ["canada_a_slow", "canada_c_fast", "canada_d_fast"]
+
+
+def test_process_pdf_matches_whole_document_cleaning(dirs, make_pdf, tmp_path):
+    raw, _ = dirs
+    pdf = raw / "eu" / "act.pdf"
+    make_pdf(pdf, [SENTENCE * 4 + "12 | ", "Page 2 of 3 " + SENTENCE * 4, ""])
+    output = tmp_path / "act.txt"
+    n_chars = preprocess.process_pdf(pdf, output, page_workers=1, page_cache=False)
+    expected = preprocess.clean_text(preprocess.extract_pdf(pdf, page_workers=1, page_cache=False))
+    assert output.read_text(encoding="utf-8") == expected
+    assert n_chars == len(expected)
+
+
+def test_page_offsets_round_trip(dirs):
+    _, processed = dirs
+    processed.mkdir()
+    preprocess.write_page_offsets(processed / "p.pages", [0, 100, 100, 250])
+    offsets = preprocess.load_page_offsets("p")
+    assert list(offsets) == [0, 100, 100, 250]
+    # Page 2 is empty: offset 100 starts page 3
+    assert [preprocess.page_for_offset(offsets, c) for c in (0, 99, 100, 249, 250, 10**6)] == \
+        [1, 1, 3, 3, 4, 4]
+    assert preprocess.load_page_offsets("missing") is None
+
+
+def test_page_cache_hits_unchanged_pages(make_pdf, tmp_path):
+    pages = [SENTENCE * 3, "Second page. " + SENTENCE, "Third page. " + SENTENCE]
+    make_pdf(tmp_path / "v1.pdf", pages)
+    make_pdf(tmp_path / "v2.pdf", [pages[0], "Revised second page. " + SENTENCE, pages[2]])
+
+    cache = preprocess.PageTextCache(tmp_path / "cache")
+    first = [cache.extract(p) for p in preprocess.PdfReader(tmp_path / "v1.pdf").pages]
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    second = [cache.extract(p) for p in preprocess.PdfReader(tmp_path / "v2.pdf").pages]
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert second[0] == first[0] and second[2] == first[2]
+    assert second[1].startswith("Revised second page.")
+
+
+def test_page_cache_evicts_least_recently_used(make_pdf, tmp_path):
+    make_pdf(tmp_path / "doc.pdf", [f"Page {i}. " + SENTENCE * 10 for i in range(6)])
+    pages = preprocess.PdfReader(tmp_path / "doc.pdf").pages
+    page_bytes = len(("Page 0. " + SENTENCE * 10).encode())
+
+    # Room for about four pages: the fifth write prunes down to three
+    cache = preprocess.PageTextCache(tmp_path / "cache", max_bytes=4 * page_bytes + 10)
+    for i in range(4):
+        cache.extract(pages[i])
+    files = sorted((tmp_path / "cache").glob("*/*.txt"), key=lambda p: p.stat().st_mtime)
+    for i, path in enumerate(files):  # distinct, increasing mtimes: page 0 is oldest
+        os.utime(path, (1000 + i, 1000 + i))
+    cache.extract(pages[0])  # a hit refreshes page 0
+    cache.extract(pages[4])
+
+    assert len(list((tmp_path / "cache").glob("*/*.txt"))) == 3
+    cache.hits = cache.misses = 0
+    cache.extract(pages[0])
+    cache.extract(pages[4])
+    assert (cache.hits, cache.misses) == (2, 0)
+    cache.extract(pages[1])
+    assert cache.misses == 1
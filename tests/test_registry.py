@@ -0,0 +1,76 @@
+"""Process-wide model/client registry and collection naming."""
+import re
+import threading
+import time
+
+import pytest
+
+from pipeline import chunking, registry
+
+
+@pytest.fixture
+def key():
+    key = ("test", "model")
+    yield key
+    for table in (registry._items, registry._load_times, registry._key_locks):
+        table.pop(key, None)
+
+
+def test_get_or_load_loads_once_for_concurrent_callers(key):
+    calls = []
+
+    def factory():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        return object()
+
+    barrier = threading.Barrier(8)
+    results = [None] * 8
+
+    def caller(i):
+        barrier.wait()
+        results[i] = registry.get_or_load(key, factory)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert registry.load_times()["test:model"] >= 0.2
+
+
+def test_get_or_load_retries_after_a_failed_load(key):
+    def broken():
+        raise OSError("model not downloaded")
+
+    with pytest.raises(OSError):
+        registry.get_or_load(key, broken)
+    assert key not in registry._items
+    assert registry.get_or_load(key, lambda: "loaded") == "loaded"
+
+
+def test_collection_name_is_a_valid_stable_slug():
+    name = registry.collection_name("paraphrase-multilingual-MiniLM-L12-v2@onnx-int8")
+    assert re.fullmatch(rf"{registry.COLLECTION_NAME}-paraphrase-multiling-[0-9a-f]{{8}}", name)
+    # Chroma's rule: 3-63 characters from [a-zA-Z0-9._-], alphanumeric at both ends
+    assert re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9._-]{1,61}[a-zA-Z0-9]", name)
+    assert registry.collection_name("paraphrase-multilingual-MiniLM-L12-v2@onnx-int8") == name
+    # A cut that lands on a separator does not leave it dangling
+    assert re.fullmatch(rf"{registry.COLLECTION_NAME}-a{{19}}-[0-9a-f]{{8}}",
+                        registry.collection_name("a" * 19 + "/b"))
+
+
+def test_collection_name_separates_models_and_chunking(monkeypatch):
+    small = registry.collection_name("text-embedding-3-small")
+    # Same 20-character slug, different model
+    assert registry.collection_name("text-embedding-3-smaller") != small
+    assert registry.collection_name("text-embedding-3-large") != small
+
+    monkeypatch.setattr(chunking, "CHUNK_SIZE", chunking.CHUNK_SIZE + 100)
+    resized = registry.collection_name("text-embedding-3-small")
+    monkeypatch.setattr(chunking, "CHUNKER_VERSION", chunking.CHUNKER_VERSION + 1)
+    assert len({small, resized, registry.collection_name("text-embedding-3-small")}) == 3
+    assert resized.rsplit("-", 1)[0] == small.rsplit("-", 1)[0]
@@ -0,0 +1,97 @@
+"""Blocked similarity matrix against a pair-by-pair reference."""
+import numpy as np
+import pytest
+
+from pipeline import similarity
+from pipeline.corpus import CorpusEmbeddings
+
+
+def _naive_cosine(vectors):
+    vectors = np.asarray(vectors, dtype=np.float64)
+    n = len(vectors)
+    matrix = np.empty((n, n))
+    for i in range(n):
+        for j in range(n):
+            matrix[i, j] = vectors[i] @ vectors[j] / (
+                np.linalg.norm(vectors[i]) * np.linalg.norm(vectors[j]))
+    return matrix
+
+
+@pytest.mark.parametrize("n, block", [(1, 4), (10, 3), (37, 8), (37, 64)])
+def test_blocked_matches_naive(n, block):
+    vectors = np.random.default_rng(n).normal(size=(n, 16)).astype(np.float32)
+    matrix = similarity.cosine_similarity_matrix(vectors, block=block)
+    np.testing.assert_allclose(matrix, _naive_cosine(vectors), atol=1e-5)
+    assert (matrix == matrix.T).all()
+    assert (np.diag(matrix) == 1.0).all()
+
+
+def test_memmap_output(tmp_path):
+    vectors = np.random.default_rng(0).normal(size=(50, 8))
+    out = similarity.similarity_memmap(50, tmp_path / "sim.f32.npy")
+    similarity.cosine_similarity_matrix(vectors, block=16, out=out)
+    out.flush()
+    np.testing.assert_allclose(np.load(tmp_path / "sim.f32.npy"), _naive_cosine(vectors),
+                               atol=1e-5)
+
+
+def _corpus(rng, n_policies=6, dim=8):
+    counts = rng.integers(1, 5, size=n_policies)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    vectors = rng.normal(size=(offsets[-1], dim)).astype(np.float32)
+    ids = [f"p{k}" for k in range(n_policies)]
+    return CorpusEmbeddings(ids, offsets, vectors, [f"c{i}" for i in range(offsets[-1])])
+
+
+def test_compute_similarity_matrix_in_memory_and_on_disk(tmp_path, monkeypatch):
+    corpus = _corpus(np.random.default_rng(1))
+    ids = ["p3", "p0", "p5", "missing"]
+    centroids = [corpus.rows(pid).astype(np.float64).mean(axis=0) for pid in ids[:3]]
+
+    matrix, got = similarity.compute_similarity_matrix(None, ids, corpus)
+    assert got == ids[:3] and matrix.dtype == np.float64
+    np.testing.assert_allclose(matrix, _naive_cosine(centroids), atol=1e-5)
+
+    memmap = similarity.similarity_memmap
+    monkeypatch.setattr(similarity, "similarity_memmap",
+                        lambda n: memmap(n, tmp_path / "sim.f32.npy"))
+    on_disk, _ = similarity.compute_similarity_matrix(None, ids, corpus, max_in_memory_mb=0)
+    assert isinstance(on_disk, np.memmap) and on_disk.dtype == np.float32
+    np.testing.assert_allclose(on_disk, matrix, atol=1e-6)
+
+
+class QueryEmbedder:
+    def __init__(self, scale=1.0, model_name=None):
+        self.calls = []
+        self.scale = scale
+        if model_name:
+            self.model_name = model_name
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [np.array([len(t), self.scale, 1.0]) for t in texts]
+
+
+@pytest.fixture
+def query_cache(monkeypatch):
+    monkeypatch.setattr(similarity, "_query_vectors", {})
+
+
+def _dims(*names):
+    return {name: {"query": f"query about {name}"} for name in names}
+
+
+def test_added_dimension_embeds_only_its_query(query_cache):
+    fn = QueryEmbedder(model_name="test-model")
+    similarity.dimension_matrix(_dims("equity", "ethics"), fn)
+    matrix, keys = similarity.dimension_matrix(_dims("equity", "ethics", "teachers"), fn)
+    assert fn.calls == [["query about equity", "query about ethics"], ["query about teachers"]]
+    assert keys == ["equity", "ethics", "teachers"]
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0)
+
+
+def test_query_vectors_are_not_shared_across_functions(query_cache):
+    first, second = QueryEmbedder(scale=1.0), QueryEmbedder(scale=-50.0)
+    a, _ = similarity.dimension_matrix(_dims("equity"), first)
+    b, _ = similarity.dimension_matrix(_dims("equity"), second)
+    assert len(second.calls) == 1 and not np.allclose(a, b)
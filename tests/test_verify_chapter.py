@@ -0,0 +1,36 @@
+"""Page resolution of matched chunks."""
+from array import array
+
+import pytest
+
+from pipeline import verify_chapter
+
+OFFSETS = array("I", [0, 1000, 2000])
+
+
+@pytest.fixture
+def offsets(monkeypatch):
+    monkeypatch.setattr(verify_chapter, "load_page_offsets", lambda pid: OFFSETS)
+
+
+def test_page_metadata_wins(offsets):
+    assert verify_chapter.resolve_page({"page": 7, "char_start": 0}) == 7
+
+
+def test_char_start_locates_the_page(offsets, monkeypatch):
+    monkeypatch.setattr(verify_chapter, "CHUNK_MODE", "sentences")
+    assert verify_chapter.resolve_page({"policy_id": "p", "chunk_index": 0,
+                                        "char_start": 1500}) == 2
+
+
+def test_position_fallback_only_for_char_windows(offsets, monkeypatch):
+    meta = {"policy_id": "p", "chunk_index": 4}  # starts at 4 * 600 = 2400
+    monkeypatch.setattr(verify_chapter, "CHUNK_MODE", "chars")
+    assert verify_chapter.resolve_page(meta) == 3
+    monkeypatch.setattr(verify_chapter, "CHUNK_MODE", "tokens")
+    assert verify_chapter.resolve_page(meta) is None
+
+
+def test_no_page_index(monkeypatch):
+    monkeypatch.setattr(verify_chapter, "load_page_offsets", lambda pid: None)
+    assert verify_chapter.resolve_page({"policy_id": "p", "char_start": 10}) is None